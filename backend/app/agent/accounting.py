@@ -0,0 +1,174 @@
+"""Token and latency accounting for model calls, with per-thread budgets.
+
+``call_model`` records one ``StepUsage`` per model call: prompt and completion tokens,
+time to first token and total latency. The ``UsageLedger`` aggregates them per thread and
+checks the thread against its token budget and the current run against its wall-clock budget.
+
+The ledger lives in process memory and keeps the most recently active threads only; with
+several workers each one reports the threads it served. Threads are reported under
+``thread_key``, a digest of their id: whoever knows a thread id can resume the conversation, so
+ids are never handed out. This module has no LangChain imports
+so the admin routes can read it without loading the agent.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+
+def thread_key(thread_id: str) -> str:
+    """Stable key reporting ``thread_id`` without revealing it."""
+    return hashlib.blake2b(thread_id.encode(), digest_size=8).hexdigest()
+
+
+@dataclass(slots=True)
+class StepUsage:
+    """One model call."""
+
+    step: int
+    started_at: float
+    prompt_tokens: int
+    completion_tokens: int
+    time_to_first_token: float
+    latency: float
+    estimated: bool = False
+    """True if the provider reported no usage and token counts were estimated from text length."""
+
+
+@dataclass
+class ThreadUsage:
+    """Model usage of one conversation thread."""
+
+    thread_id: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    model_time: float = 0.0
+    run_started_at: Optional[float] = None
+    last_active_at: float = 0.0
+    stopped: Optional[str] = None
+    steps: List[StepUsage] = field(default_factory=list)
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def summary(self) -> Dict[str, Any]:
+        latencies = [step.latency for step in self.steps]
+        ttfts = [step.time_to_first_token for step in self.steps]
+        return {
+            "thread": thread_key(self.thread_id),
+            "steps": len(self.steps),
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.total_tokens,
+            "model_seconds": round(self.model_time, 3),
+            "mean_latency_seconds": round(sum(latencies) / len(latencies), 3) if latencies else None,
+            "mean_time_to_first_token_seconds": round(sum(ttfts) / len(ttfts), 3) if ttfts else None,
+            "last_active_at": self.last_active_at,
+            "stopped": self.stopped,
+        }
+
+
+class UsageLedger:
+    """Per-thread usage of the most recently active ``max_threads`` threads."""
+
+    def __init__(self, max_threads: int = 1000):
+        self.max_threads = max_threads
+        self._threads: "OrderedDict[str, ThreadUsage]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _thread(self, thread_id: str) -> ThreadUsage:
+        usage = self._threads.get(thread_id)
+        if usage is None:
+            usage = self._threads[thread_id] = ThreadUsage(thread_id)
+            while len(self._threads) > self.max_threads:
+                self._threads.popitem(last=False)
+        self._threads.move_to_end(thread_id)
+        return usage
+
+    def start_run(self, thread_id: str) -> None:
+        """Mark the start of a new run (a new user turn) on ``thread_id``."""
+        with self._lock:
+            usage = self._thread(thread_id)
+            usage.run_started_at = time.time()
+            usage.stopped = None
+
+    def record(
+        self,
+        thread_id: str,
+        prompt_tokens: int,
+        completion_tokens: int,
+        time_to_first_token: float,
+        latency: float,
+        estimated: bool = False,
+    ) -> StepUsage:
+        """Record one model call on ``thread_id``."""
+        with self._lock:
+            usage = self._thread(thread_id)
+            now = time.time()
+            step = StepUsage(
+                step=len(usage.steps) + 1,
+                started_at=now - latency,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                time_to_first_token=time_to_first_token,
+                latency=latency,
+                estimated=estimated,
+            )
+            usage.steps.append(step)
+            usage.prompt_tokens += prompt_tokens
+            usage.completion_tokens += completion_tokens
+            usage.model_time += latency
+            usage.last_active_at = now
+            if usage.run_started_at is None:
+                usage.run_started_at = step.started_at
+            return step
+
+    def over_budget(self, thread_id: str, max_tokens: int, max_run_seconds: float) -> Optional[str]:
+        """Return why ``thread_id`` is over budget, or None. A limit of 0 disables that budget."""
+        with self._lock:
+            usage = self._threads.get(thread_id)
+            if usage is None:
+                return None
+            reason = None
+            if max_tokens and usage.total_tokens >= max_tokens:
+                reason = f"token budget of {max_tokens} exhausted ({usage.total_tokens} used)"
+            elif max_run_seconds and usage.run_started_at is not None:
+                elapsed = time.time() - usage.run_started_at
+                if elapsed >= max_run_seconds:
+                    reason = f"time budget of {max_run_seconds:g} s exhausted ({elapsed:.1f} s elapsed)"
+            usage.stopped = reason or usage.stopped
+            return reason
+
+    def threads(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Summaries of the most recently active threads, newest first."""
+        with self._lock:
+            recent = list(self._threads.values())[-limit:]
+        return [usage.summary() for usage in reversed(recent)]
+
+    def thread(self, key: str) -> Optional[Dict[str, Any]]:
+        """Summary and per-step usage of the thread with ``thread_key`` ``key``, or None if it is unknown."""
+        with self._lock:
+            usage = next((usage for usage in self._threads.values() if thread_key(usage.thread_id) == key), None)
+            if usage is None:
+                return None
+            return {**usage.summary(), "step_usage": [asdict(step) for step in usage.steps]}
+
+    def totals(self) -> Dict[str, Any]:
+        """Usage summed over all tracked threads."""
+        with self._lock:
+            threads = list(self._threads.values())
+        return {
+            "threads": len(threads),
+            "steps": sum(len(usage.steps) for usage in threads),
+            "prompt_tokens": sum(usage.prompt_tokens for usage in threads),
+            "completion_tokens": sum(usage.completion_tokens for usage in threads),
+            "model_seconds": round(sum(usage.model_time for usage in threads), 3),
+            "stopped_threads": sum(1 for usage in threads if usage.stopped),
+        }
+
+
+ledger = UsageLedger()
@@ -0,0 +1,75 @@
+"""In-memory conversation checkpoints, bounded by number of threads.
+
+The CopilotKit endpoint reads and resumes threads by id, so the agent graph needs a
+checkpointer. ``MemorySaver`` keeps every thread for the life of the process;
+``BoundedMemorySaver`` keeps the most recently used ``max_threads`` and deletes the least
+recently used one beyond that, like the usage ledger in ``app.agent.accounting``.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Sequence, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+
+class BoundedMemorySaver(MemorySaver):
+    """``MemorySaver`` holding the checkpoints of the ``max_threads`` most recently used threads."""
+
+    def __init__(self, max_threads: int = 1000, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self._recent: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, config: RunnableConfig, stored: bool) -> None:
+        """Mark the thread of ``config`` as used; ``stored`` if something is written for it."""
+        thread_id = config["configurable"].get("thread_id")
+        if thread_id is None:
+            return
+        evicted: List[str] = []
+        with self._lock:
+            if thread_id not in self._recent and not stored:
+                return
+            self._recent[thread_id] = None
+            self._recent.move_to_end(thread_id)
+            while len(self._recent) > self.max_threads:
+                evicted.append(self._recent.popitem(last=False)[0])
+        for old in evicted:
+            self.delete_thread(old)
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        self._touch(config, stored=False)
+        return super().get_tuple(config)
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        self._touch(config, stored=True)
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        self._touch(config, stored=True)
+        super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._recent.pop(thread_id, None)
+        super().delete_thread(thread_id)
@@ -6,6 +6,7 @@ from dataclasses import dataclass, field, fields
 from typing import Annotated
 
 from app.agent import prompts
+from app.config import settings
 from langchain_core.runnables import ensure_config
 from langgraph.config import get_config
 
@@ -35,6 +36,24 @@ class Configuration:
         metadata={"description": "The maximum number of search results to return for each search query."},
     )
 
+    max_thread_tokens: int = field(
+        default_factory=lambda: settings.agent_thread_token_budget,
+        metadata={"description": "Token budget of one conversation thread; 0 for no limit."},
+    )
+
+    max_run_seconds: float = field(
+        default_factory=lambda: settings.agent_run_time_budget,
+        metadata={"description": "Wall-clock budget in seconds of one run (user turn); 0 for no limit."},
+    )
+
+    max_parallel_tasks: int = field(
+        default_factory=lambda: settings.agent_max_parallel_tasks,
+        metadata={
+            "description": "Most sub-questions a compound question is split into and answered in parallel; "
+            "0 or 1 disables planning."
+        },
+    )
+
     @classmethod
     def from_context(cls) -> Configuration:
         """Create a Configuration instance from a RunnableConfig object."""
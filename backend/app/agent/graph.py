@@ -1,27 +1,170 @@
 """Define a custom Reasoning and Action agent.
 
 Works with a chat model with tool calling support.
+
+Every turn starts at a planning node. A compound question whose parts can be answered
+independently ("compare revenue by store and list the top actors") is split into sub-questions
+that run as parallel branches, each its own model ⇄ tools loop with its own SQL, and a merge node
+then writes the answer; the turn takes as long as its slowest branch rather than the sum of all
+of them. Any other question goes through the model ⇄ tools loop directly. Planning costs a model
+call, so it is only attempted for questions that look compound (``looks_compound``).
 """
 
-from typing import Dict, List, Literal, cast
+import re
+import time
+from typing import Any, Dict, List, Literal, Optional, Union, cast
 
+from app.agent import prompts
+from app.agent.accounting import ledger
 from app.agent.configuration import Configuration
-from app.agent.state import AgentState, InputState, SQLAgentState
-from app.agent.tools import TOOLS
+from app.agent.state import AgentState, BranchState, InputState, SQLAgentState
+from app.agent.tools import TOOLS, describe_schema
 from app.agent.utils import load_chat_model
+from copilotkit.langgraph import copilotkit_customize_config
 from dotenv import load_dotenv
-from langchain_core.messages import AIMessage
+from langchain_core.messages import (
+    AIMessage,
+    BaseMessage,
+    HumanMessage,
+    message_chunk_to_message,
+)
+from langchain_core.runnables import RunnableConfig
 from langgraph.checkpoint.memory import MemorySaver
+from langgraph.config import get_config
 from langgraph.graph import StateGraph
 from langgraph.prebuilt import ToolNode
+from langgraph.types import Send
+from pydantic import BaseModel, Field
 
 load_dotenv()
 
+
+def _thread_id() -> str:
+    try:
+        config = get_config()
+    except RuntimeError:
+        return "default"
+    return str((config.get("configurable") or {}).get("thread_id", "default"))
+
+
+def _record_usage(thread_id: str, prompt: list, response: AIMessage, ttft: float, latency: float) -> None:
+    usage = response.usage_metadata
+    if usage:
+        ledger.record(thread_id, usage["input_tokens"], usage["output_tokens"], ttft, latency)
+    else:
+        # The provider reported no usage: estimate roughly four characters per token
+        prompt_chars = sum(len(str(m["content"] if isinstance(m, dict) else m.content)) for m in prompt)
+        completion_chars = len(str(response.content)) + len(str(response.tool_calls))
+        ledger.record(thread_id, prompt_chars // 4, completion_chars // 4, ttft, latency, estimated=True)
+
+
+def _budget_notice(message_id: Optional[str], reason: str) -> Dict[str, List[AIMessage]]:
+    content = f"Sorry, I have to stop here: this conversation's {reason}."
+    return {"messages": [AIMessage(id=message_id, content=content)]}
+
+
+def _quiet_config() -> RunnableConfig:
+    """The current config, with messages and tool calls kept out of the CopilotKit stream."""
+    return copilotkit_customize_config(get_config(), emit_messages=False, emit_tool_calls=False)
+
+
+async def _call(model: Any, prompt: list, thread_id: str, config: Optional[RunnableConfig] = None) -> AIMessage:
+    """Stream ``model``'s response to ``prompt``, recording its usage, time to first token and latency."""
+    started = time.perf_counter()
+    time_to_first_token, chunks = None, None
+    async for chunk in model.astream(prompt, config):
+        if time_to_first_token is None:
+            time_to_first_token = time.perf_counter() - started
+        chunks = chunk if chunks is None else chunks + chunk
+    latency = time.perf_counter() - started
+    if chunks is None:
+        # The provider streamed nothing: treat it as an empty answer
+        time_to_first_token, response = latency, AIMessage(content="")
+    else:
+        response = cast(AIMessage, message_chunk_to_message(chunks))
+    _record_usage(thread_id, prompt, response, time_to_first_token, latency)
+    return response
+
+
+def _question(messages: List[BaseMessage]) -> str:
+    """The user's latest question."""
+    return next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+
+
+# Explicit markers of a compound question: a second question mark after some text, a semicolon, a
+# comparison, or a conjunction starting a second request ("... and list the top actors"). Commas
+# and other uses of "and" ("revenue by store and month") do not count, so ordinary questions skip
+# the planning call.
+_REQUEST = r"(what|which|who|whom|how|when|where|why|list|show|give|find|tell|count|rank|compare)"
+_COMPOUND = re.compile(
+    rf"\?.*\w.*\?|;|\b(compare|versus|vs)\b|\b(and|also|plus|as well as)\s+(also\s+)?{_REQUEST}\b",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+def looks_compound(question: str) -> bool:
+    """Whether ``question`` may ask for several independent things, and is worth planning."""
+    return bool(_COMPOUND.search(question))
+
+
+class Plan(BaseModel):
+    """Independent sub-questions that together answer the user's question."""
+
+    tasks: List[str] = Field(
+        description="Self-contained sub-questions, each answerable with its own query; "
+        "a single task if the question should not be split"
+    )
+
+
+async def plan(state: AgentState) -> Dict[str, Any]:
+    """Start a turn: split a compound question into independent sub-questions.
+
+    The tasks are only kept if there are at least two of them; planning is skipped when
+    ``max_parallel_tasks`` is below two, the thread is over budget or the question does not look
+    compound, so simple questions go to the tool loop without the extra model call.
+    """
+    configuration = Configuration.from_context()
+    thread_id = _thread_id()
+    reset = {"tasks": [], "findings": None}
+    if not state.messages or not isinstance(state.messages[-1], HumanMessage):
+        return reset
+    ledger.start_run(thread_id)
+    max_tasks = configuration.max_parallel_tasks
+    if max_tasks < 2 or ledger.over_budget(thread_id, configuration.max_thread_tokens, configuration.max_run_seconds):
+        return reset
+    if not looks_compound(_question(state.messages)):
+        return reset
+
+    model = load_chat_model(configuration.model).with_structured_output(Plan, include_raw=True)
+    prompt = [{"role": "system", "content": prompts.PLANNER_PROMPT.format(max_tasks=max_tasks)}, *state.messages]
+    started = time.perf_counter()
+    output = await model.ainvoke(prompt, _quiet_config())
+    latency = time.perf_counter() - started
+    _record_usage(thread_id, prompt, output["raw"], latency, latency)
+
+    parsed = output["parsed"]
+    tasks = [task.strip() for task in parsed.tasks if task.strip()][:max_tasks] if parsed else []
+    return {**reset, "tasks": tasks if len(tasks) > 1 else []}
+
+
+def route_plan(state: AgentState) -> Union[Literal["call_model"], List[Send]]:
+    """Fan out one branch per planned sub-question, or continue with the tool loop."""
+    if not state.tasks:
+        return "call_model"
+    question = _question(state.messages)
+    return [
+        Send("run_branch", BranchState(task=task, question=question, index=index))
+        for index, task in enumerate(state.tasks)
+    ]
+
+
 # Define the function that calls the model
 async def call_model(state: AgentState) -> Dict[str, List[AIMessage]]:
     """Call the LLM powering our "agent".
 
-    This function prepares the prompt, initializes the model, and processes the response.
+    This function prepares the prompt, initializes the model, and processes the response. Token
+    usage, time to first token and latency of the call are recorded in the usage ledger, and the
+    run is ended with a notice once the thread's token budget or the run's time budget is spent.
 
     Args:
         state (State): The current state of the conversation.
@@ -31,18 +174,20 @@ async def call_model(state: AgentState) -> Dict[str, List[AIMessage]]:
         dict: A dictionary containing the model's response message.
     """
     configuration = Configuration.from_context()
+    thread_id = _thread_id()
+    exceeded = ledger.over_budget(thread_id, configuration.max_thread_tokens, configuration.max_run_seconds)
+    if exceeded:
+        return _budget_notice(None, exceeded)
 
     # Initialize the model with tool binding. Change the model or add more tools here.
     model = load_chat_model(configuration.model).bind_tools(TOOLS)
 
     # Format the system prompt. Customize this to change the agent's behavior.
     system_message = configuration.system_prompt
+    prompt = [{"role": "system", "content": system_message}, *state.messages]
 
-    # Get the model's response
-    response = cast(
-        AIMessage,
-        await model.ainvoke([{"role": "system", "content": system_message}, *state.messages]),
-    )
+    # Get the model's response, streamed so the time to the first token can be measured
+    response = await _call(model, prompt, thread_id)
 
     # Handle the case when it's the last step and the model still wants to use a tool
     if state.is_last_step and response.tool_calls:
@@ -55,22 +200,15 @@ async def call_model(state: AgentState) -> Dict[str, List[AIMessage]]:
             ]
         }
 
+    # Likewise when this call used up the budget: end the run instead of running more tools
+    exceeded = ledger.over_budget(thread_id, configuration.max_thread_tokens, configuration.max_run_seconds)
+    if exceeded and response.tool_calls:
+        return _budget_notice(response.id, exceeded)
+
     # Return the model's response as a list to be added to existing messages
     return {"messages": [response]}
 
 
-# Define a new graph
-builder = StateGraph(AgentState, input=InputState, config_schema=Configuration)
-
-# Define the two nodes we will cycle between
-builder.add_node(call_model)
-builder.add_node("tools", ToolNode(TOOLS))
-
-# Set the entrypoint as `call_model`
-# This means that this node is the first one called
-builder.add_edge("__start__", "call_model")
-
-
 def route_model_output(state: SQLAgentState) -> Literal["__end__", "tools"]:
     """Determine the next node based on the model's output."""
     last_message = state.messages[-1]
@@ -89,17 +227,81 @@ def route_model_output(state: SQLAgentState) -> Literal["__end__", "tools"]:
     return "tools"
 
 
-# Add a conditional edge to determine the next step after `call_model`
-builder.add_conditional_edges(
-    "call_model",
+def add_tool_loop(builder: StateGraph) -> None:
+    """Add the two nodes we cycle between, `call_model` and `tools`, to ``builder``."""
+    builder.add_node(call_model)
+    builder.add_node("tools", ToolNode(TOOLS))
+
     # After call_model finishes running, the next node(s) are scheduled
     # based on the output from route_model_output
-    route_model_output,
-)
+    builder.add_conditional_edges("call_model", route_model_output)
+
+    # Add a normal edge from `tools` to `call_model`
+    # This creates a cycle: after using tools, we always return to the model
+    builder.add_edge("tools", "call_model")
+
+
+# The loop run by each parallel branch, on a conversation of its own. It is not checkpointed:
+# branches are short-lived and only their answers are kept, in the parent's state.
+branch_builder = StateGraph(AgentState, config_schema=Configuration)
+add_tool_loop(branch_builder)
+branch_builder.add_edge("__start__", "call_model")
+branch_graph = branch_builder.compile(checkpointer=False, name="branch")
+
+
+async def run_branch(branch: BranchState) -> Dict[str, List[Dict[str, Any]]]:
+    """Answer one sub-question with the tool loop, recording the answer and the queries it ran."""
+    # Given the schema up front, a branch saves the round-trip of asking for it
+    schema = await describe_schema()
+    content = prompts.BRANCH_PROMPT.format(task=branch.task, question=branch.question, schema=schema)
+    try:
+        result = await branch_graph.ainvoke({"messages": [HumanMessage(content=content)]}, _quiet_config())
+    except Exception as e:
+        return {"findings": [{"index": branch.index, "task": branch.task, "answer": f"Failed: {e}", "queries": []}]}
+    messages = result["messages"]
+    queries = [
+        call["args"].get("query")
+        for message in messages
+        if isinstance(message, AIMessage)
+        for call in message.tool_calls
+        if call["name"] == "run_query"
+    ]
+    finding = {"index": branch.index, "task": branch.task, "answer": str(messages[-1].content), "queries": queries}
+    return {"findings": [finding]}
+
+
+async def merge(state: AgentState) -> Dict[str, List[AIMessage]]:
+    """Write the answer to the user's question from the answers of its sub-questions."""
+    configuration = Configuration.from_context()
+    thread_id = _thread_id()
+    findings = sorted(state.findings or [], key=lambda finding: finding["index"])
+    sections = "\n\n".join(
+        f"Sub-question {n}: {finding['task']}\nAnswer: {finding['answer']}" for n, finding in enumerate(findings, 1)
+    )
+
+    # Out of budget: hand over the branch answers as they are rather than calling the model again
+    if ledger.over_budget(thread_id, configuration.max_thread_tokens, configuration.max_run_seconds):
+        return {"messages": [AIMessage(content=sections)]}
 
-# Add a normal edge from `tools` to `call_model`
-# This creates a cycle: after using tools, we always return to the model
-builder.add_edge("tools", "call_model")
+    model = load_chat_model(configuration.model)
+    prompt = [{"role": "system", "content": prompts.MERGE_PROMPT.format(findings=sections)}, *state.messages]
+    response = await _call(model, prompt, thread_id)
+    return {"messages": [response]}
+
+
+# Define a new graph
+builder = StateGraph(AgentState, input=InputState, config_schema=Configuration)
+
+# Every turn starts by planning, then either fans out to parallel branches that are merged
+# into the answer, or runs the model ⇄ tools loop
+builder.add_node(plan)
+builder.add_node(run_branch)
+builder.add_node(merge)
+add_tool_loop(builder)
+builder.add_edge("__start__", "plan")
+builder.add_conditional_edges("plan", route_plan, ["call_model", "run_branch"])
+builder.add_edge("run_branch", "merge")
+builder.add_edge("merge", "__end__")
 
 # Compile the builder into an executable graph
 memory = MemorySaver()
@@ -108,8 +310,6 @@ graph = builder.compile(name="powersim_agent")
 if __name__ == "__main__":
     import asyncio
 
-    from langchain_core.messages import HumanMessage
-
     async def main():
         # Define the input using proper message format
         input_data = {
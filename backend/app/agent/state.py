@@ -1,6 +1,6 @@
 # Define agent state
 from dataclasses import dataclass, field
-from typing import Annotated, Dict, List, Optional, Sequence
+from typing import Annotated, Any, Dict, List, Optional, Sequence
 
 from copilotkit import CopilotKitState  # noqa: F401
 from langchain_core.messages import AnyMessage
@@ -43,6 +43,10 @@ class AgentState(InputState):
     remaining_steps: RemainingSteps = 25
     is_last_step: IsLastStep = field(default=False)
     progress: Optional[str] = None
+    tasks: List[str] = field(default_factory=list)
+    """Independent sub-questions the planner split the latest question into; empty if it was not split."""
+    findings: Annotated[Optional[List[Dict[str, Any]]], merge_lists] = None
+    """Answers of the sub-question branches, merged into the final answer. Reset by the planner each turn."""
 
     def items(self):
         """Make AgentState behave like a dictionary for CopilotKit compatibility.
@@ -60,6 +64,15 @@ class AgentState(InputState):
         return getattr(self, key, default)
 
 
+@dataclass
+class BranchState:
+    """Input of one parallel branch answering a sub-question."""
+
+    task: str
+    question: str
+    index: int = 0
+
+
 @dataclass
 class SQLAgentState(AgentState):
     """Extended state for SQL agent with query tracking."""
@@ -0,0 +1,125 @@
+"""Statistical summaries of query results, returned to the model instead of large row sets.
+
+``summarize`` profiles every column of a result with vectorized pandas operations: non-null
+count, null rate and distinct count for all columns; min, max, mean, standard deviation and
+quantiles for numeric columns; the most frequent values for text columns; and, for date
+columns, the range plus a series of row counts and numeric sums per day, week, month or year.
+An evenly spaced sample of rows is included so the model still sees concrete records.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+# Bucket sizes tried for date series, finest first, as pandas period frequencies
+_PERIODS = (("day", "D"), ("week", "W"), ("month", "M"), ("quarter", "Q"), ("year", "Y"))
+
+
+def _value(value: Any) -> Any:
+    """Convert a pandas/NumPy scalar to a JSON-friendly Python value; NaN and NaT become None."""
+    import pandas as pd
+
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float):
+        return round(value, 6)
+    return value
+
+
+def _as_dates(column: "pd.Series") -> Optional["pd.Series"]:
+    """Return ``column`` parsed as datetimes if it holds dates (SQLite returns them as text), else None."""
+    import pandas as pd
+
+    if pd.api.types.is_datetime64_any_dtype(column):
+        return column
+    if column.dtype != object:
+        return None
+    values = column.dropna()
+    if values.empty or not isinstance(values.iloc[0], str):
+        return None
+    probe = pd.to_datetime(values.iloc[:50], errors="coerce", format="ISO8601")
+    if probe.notna().mean() < 0.9:
+        return None
+    return pd.to_datetime(column, errors="coerce", format="ISO8601")
+
+
+def _series(dates: "pd.Series", numeric: "pd.DataFrame", max_points: int) -> Dict[str, Any]:
+    """Row counts and numeric column sums per time bucket, at the finest bucket size giving at most
+    ``max_points`` buckets."""
+    valid = dates.notna()
+    dates, numeric = dates[valid], numeric[valid]
+    for name, frequency in _PERIODS:
+        periods = dates.dt.to_period(frequency)
+        if periods.nunique() <= max_points or name == "year":
+            break
+    # Sums of identifier columns carry no meaning
+    measures = numeric[[c for c in numeric.columns if not (str(c) == "id" or str(c).endswith("_id"))]]
+    table = measures.groupby(periods.values).sum() if len(measures.columns) else None
+    counts = periods.value_counts().sort_index()
+    points = []
+    for period, rows in counts.items():
+        point = {"period": str(period), "rows": int(rows)}
+        if table is not None:
+            point.update({f"{column}_sum": _value(table.at[period, column]) for column in table.columns})
+        points.append(point)
+    return {"bucket": name, "points": points}
+
+
+def summarize(result: "pd.DataFrame", sample_rows: int = 10, top_k: int = 5, max_points: int = 60) -> Dict[str, Any]:
+    """Profile ``result`` column by column and return the profiles with an evenly spaced row sample."""
+    import numpy as np
+
+    rows = len(result)
+    numeric = result.select_dtypes("number")
+    counts = result.count()
+    distinct = result.nunique(dropna=True)
+    quantiles = numeric.quantile(list(QUANTILES)) if len(numeric.columns) else None
+    described = numeric.agg(["min", "max", "mean", "std", "sum"]) if len(numeric.columns) else None
+
+    columns: Dict[str, Dict[str, Any]] = {}
+    for name in result.columns:
+        column = result[name]
+        profile: Dict[str, Any] = {
+            "count": int(counts[name]),
+            "null_rate": round(1 - float(counts[name]) / rows, 4) if rows else 0.0,
+            "distinct": int(distinct[name]),
+        }
+        if name in numeric.columns:
+            profile["type"] = "number"
+            profile.update({stat: _value(described.at[stat, name]) for stat in described.index})
+            profile["quantiles"] = {f"p{round(q * 100):02d}": _value(quantiles.at[q, name]) for q in QUANTILES}
+        elif (dates := _as_dates(column)) is not None:
+            profile["type"] = "date"
+            profile["min"], profile["max"] = _value(dates.min()), _value(dates.max())
+            profile["series"] = _series(dates, numeric, max_points)
+        else:
+            profile["type"] = "text"
+            top = column.value_counts(dropna=True).head(top_k)
+            profile["top"] = [
+                {"value": _value(value), "count": int(count), "share": round(float(count) / rows, 4)}
+                for value, count in top.items()
+            ]
+        columns[str(name)] = profile
+
+    positions = np.unique(np.linspace(0, rows - 1, min(sample_rows, rows)).astype(int)) if rows else []
+    sample: List[Dict[str, Any]] = [
+        {str(key): _value(value) for key, value in record.items()}
+        for record in result.iloc[positions].to_dict(orient="records")
+    ]
+    return {
+        "summary": True,
+        "row_count": rows,
+        "note": (
+            f"The query returned {rows} rows, too many to list. Column profiles and {len(sample)} evenly "
+            "spaced sample rows follow; aggregate in SQL if exact per-row figures are needed."
+        ),
+        "columns": columns,
+        "sample": sample,
+    }
@@ -1,10 +1,20 @@
+import asyncio
 import json
 import sqlite3
+from contextlib import closing
 from pathlib import Path
-from typing import Any, Callable, Dict, List
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
 
-import pandas as pd
+from app.agent.summary import summarize
+from app.api.insights import registry as insight_registry
+from app.config import settings
+from app.db.approximate import CONFIDENCE, sample_store
+from app.db.database import SessionLocal, data_version, snapshot
+from app.db.statistics import table_statistics
+from app.utils.cache import cache
+from app.utils.singleflight import SingleFlight, normalize_sql
 from copilotkit.langgraph import copilotkit_emit_state
+from fastapi import HTTPException
 from langchain_core.runnables.config import RunnableConfig
 from langchain_core.tools import tool
 from langchain_core.tools.base import InjectedToolCallId
@@ -12,6 +22,9 @@ from langgraph.prebuilt import InjectedState
 from tenacity import retry, stop_after_attempt, wait_exponential
 from typing_extensions import Annotated
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 # Database path
 DB_PATH = Path(__file__).parent.parent.parent / "data" / "sqlite-sakila.db"
 
@@ -20,11 +33,19 @@ class SQLiteDatabase:
     def __init__(self, db_path: Path):
         self.db_path = db_path
 
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection, reading from the in-memory snapshot when it is enabled for this database."""
+        if snapshot is not None and Path(snapshot.source_path) == self.db_path:
+            return snapshot.connect()
+        return sqlite3.connect(self.db_path)
+
     @retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1, min=4, max=10))
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def execute_query(self, query: str) -> "pd.DataFrame":
         """Execute a SQL query with retry logic."""
+        import pandas as pd
+
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with closing(self.connect()) as conn:
                 return pd.read_sql_query(query, conn)
         except sqlite3.Error as e:
             raise Exception(f"Database error: {str(e)}")
@@ -34,7 +55,7 @@ class SQLiteDatabase:
     def get_schema(self) -> Dict[str, List[str]]:
         """Get the database schema."""
         schema = {}
-        with sqlite3.connect(self.db_path) as conn:
+        with closing(self.connect()) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
             tables = cursor.fetchall()
@@ -50,31 +71,147 @@ class SQLiteDatabase:
 # Initialize database
 db = SQLiteDatabase(DB_PATH)
 
+# Identical queries from concurrent agent runs share one execution
+query_flights = SingleFlight()
+
+
+async def describe_schema() -> str:
+    """The schema as returned by ``get_schema``: columns, row count and indexed columns per table,
+    cached per data version."""
+
+    def describe() -> bytes:
+        stats = table_statistics.get()
+        schema = {}
+        for table, columns in db.get_schema().items():
+            schema[table] = {"columns": columns}
+            if table in stats:
+                schema[table]["rows"] = stats[table]["rows"]
+                leading = {index["columns"][0] for index in stats[table]["indexes"] if index["columns"]}
+                schema[table]["indexed"] = sorted(leading - {None})
+        return json.dumps(schema, indent=2).encode()
+
+    digest = await asyncio.to_thread(cache.get_or_set, f"schema:{data_version()}", describe)
+    return digest.decode()
+
 
-@tool(description="Get the database schema", return_direct=False)
+@tool(description="Get the database schema: columns, row count and indexed columns per table", return_direct=False)
 async def get_schema(
     tool_call_id: Annotated[str, InjectedToolCallId],
     state: Annotated[Any, InjectedState],
 ) -> str:
-    """Get the database schema."""
-    schema = db.get_schema()
-    return json.dumps(schema, indent=2)
+    """Get the database schema, with the row count and indexed columns of every table."""
+    return await describe_schema()
 
 
-@tool(description="Run a query on the database", return_direct=True)
+@tool(
+    description="Get statistics of database tables: row counts, estimated distinct values per column, date "
+    "column ranges and indexes. Use them to join from small tables, filter early and on indexed columns. "
+    "Pass table names to limit the output; omit them for all tables.",
+    return_direct=False,
+)
+async def get_table_stats(
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    state: Annotated[Any, InjectedState],
+    tables: Optional[List[str]] = None,
+) -> str:
+    """Get row counts, distinct-value estimates, date ranges and indexes of tables."""
+    stats = await asyncio.to_thread(table_statistics.get, tables)
+    if tables and not stats:
+        return f"No statistics for {', '.join(tables)}. Check the table names with get_schema."
+    return json.dumps(stats)
+
+
+@tool(
+    description="Run a query on the database. For exploratory SUM, COUNT or AVG questions over the large payment "
+    "and rental tables, pass approximate=true to get estimates from a sample, much faster on large data, with "
+    "95% confidence intervals in <column>_ci. Queries a sample cannot answer (COUNT(DISTINCT), MIN, MAX, "
+    "HAVING, no aggregate) run exactly instead.",
+    return_direct=True,
+)
 async def run_query(
     tool_call_id: Annotated[str, InjectedToolCallId],
     state: Annotated[Any, InjectedState],
     config: RunnableConfig,
     query: str,
+    approximate: bool = False,
 ) -> str:
-    """Run a SQL query on the database with retry logic."""
+    """Run a SQL query on the database with retry logic. Results above the summary threshold are
+    returned as column profiles plus a sample of rows. Approximate queries are estimated from
+    samples of the fact tables when they can be, and flagged as approximate."""
     await copilotkit_emit_state(config, {"progress": "Running query..."})
-    try:
-        result = db.execute_query(query)
+
+    def format_result(result: "pd.DataFrame") -> str:
+        # Large results are profiled rather than sent row by row
+        threshold = settings.agent_summary_threshold
+        if threshold and len(result) > threshold:
+            return json.dumps(summarize(result, sample_rows=settings.agent_summary_sample_rows))
         return result.to_json(orient="records")
+
+    def execute_and_format() -> str:
+        return format_result(db.execute_query(query))
+
+    def estimate_and_format() -> str:
+        import pandas as pd
+
+        estimate = sample_store.query(query)
+        if not estimate.approximate:
+            return f"Exact result, as {estimate.reason}: {execute_and_format()}"
+        records = estimate.records()
+        if settings.agent_summary_threshold and len(records) > settings.agent_summary_threshold:
+            rows = format_result(pd.DataFrame(estimate.rows, columns=estimate.columns))
+        else:
+            rows = json.dumps(records, default=str)
+        return (
+            f'{{"approximate": true, "confidence": {CONFIDENCE}, "sample_rate": {estimate.sample_rate}, '
+            f'"note": "Estimated from a sample; report the figures as approximate.", "rows": {rows}}}'
+        )
+
+    async def execute() -> str:
+        return await asyncio.to_thread(estimate_and_format if approximate else execute_and_format)
+
+    try:
+        return await query_flights.do((normalize_sql(query), approximate, data_version()), execute)
     except Exception as e:
         return f"Error executing query: {str(e)}"
 
 
-TOOLS: List[Callable[..., Any]] = [get_schema, run_query]
+def _describe_insights() -> str:
+    lines = [
+        "Get a predefined dashboard insight by name. Prefer this over writing SQL when one of these answers "
+        "the question; params is an optional object of the listed parameters. Insights:"
+    ]
+    for insight in insight_registry:
+        params = ", ".join(param.name for param in insight.params)
+        columns = ", ".join(insight.adapter.fields)
+        lines.append(f"- {insight.name}({params}): {insight.description}. Columns: {columns}")
+    return "\n".join(lines)
+
+
+@tool(description=_describe_insights(), return_direct=False)
+async def get_insight(
+    tool_call_id: Annotated[str, InjectedToolCallId],
+    state: Annotated[Any, InjectedState],
+    name: str,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Get a predefined insight, served from the same registry, cache and engine as the dashboard routes."""
+    if name not in insight_registry:
+        return f"Unknown insight {name!r}. Available insights: {', '.join(i.name for i in insight_registry)}"
+    insight, values = insight_registry[name], params or {}
+    key = f"insight:{name}:{json.dumps(values, sort_keys=True, default=str)}:{data_version()}"
+
+    def render() -> bytes:
+        with closing(SessionLocal()) as session:
+            return insight_registry.render_values(name, session, values)
+
+    def load() -> bytes:
+        return render() if insight.cost == "cheap" else cache.get_or_set(key, render)
+
+    try:
+        payload = await query_flights.do(key, lambda: asyncio.to_thread(load))
+    except HTTPException as e:
+        return f"Error getting insight: {e.detail}"
+    return payload.decode()
+
+
+TOOLS: List[Callable[..., Any]] = [get_schema, get_table_stats, get_insight, run_query]
@@ -1,7 +1,6 @@
 import re
 from typing import List
 
-from IPython.display import Image, display
 from langchain.chat_models import init_chat_model
 from langchain_core.language_models import BaseChatModel
 
@@ -39,6 +38,8 @@ def save_graph_diagram(graph, filename="graph.png"):
         graph: The graph to be depicted.
         filename: The name of the file to save the graph as.
     """
+    from IPython.display import Image, display
+
     try:
         graph = graph.get_graph(xray=True).draw_mermaid_png()
         with open(filename, "wb") as f:
@@ -64,4 +65,6 @@ def load_chat_model(fully_specified_name: str) -> BaseChatModel:
         fully_specified_name (str): String in the format 'provider/model'.
     """
     provider, model = fully_specified_name.split("/", maxsplit=1)
-    return init_chat_model(model, model_provider=provider)
+    # OpenAI only reports token usage for streamed responses when asked to
+    kwargs = {"stream_usage": True} if provider == "openai" else {}
+    return init_chat_model(model, model_provider=provider, **kwargs)
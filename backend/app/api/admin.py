@@ -0,0 +1,46 @@
+"""Operational routes: agent admission metrics and model usage.
+
+The routes are off unless ``ADMIN_TOKEN`` is set, and then require it as a bearer token.
+"""
+
+import hmac
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+
+from ..agent.accounting import ledger
+from ..config import settings
+from .admission import admission
+
+
+def require_admin(authorization: Optional[str] = Header(None)) -> None:
+    """Reject requests without ``Authorization: Bearer <ADMIN_TOKEN>``; answer 404 if no token is set."""
+    if not settings.admin_token:
+        raise HTTPException(status_code=404, detail="Not Found")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.encode(), settings.admin_token.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/admin/admission")
+async def get_admission_metrics():
+    """Agent run admission metrics: active runs, queue depth, wait times and rejections."""
+    return {"status": "success", "data": admission.metrics()}
+
+
+@router.get("/admin/agent-usage")
+async def get_agent_usage(limit: int = Query(100, ge=1, le=1000)):
+    """Model token usage and latency, in total and for the most recently active threads."""
+    return {"status": "success", "data": {"totals": ledger.totals(), "threads": ledger.threads(limit)}}
+
+
+@router.get("/admin/agent-usage/{thread}")
+async def get_thread_usage(thread: str):
+    """Model token usage and latency of one thread, by the ``thread`` key listed in agent-usage, step by step."""
+    usage = ledger.thread(thread)
+    if usage is None:
+        raise HTTPException(status_code=404, detail=f"No usage recorded for thread {thread}")
+    return {"status": "success", "data": usage}
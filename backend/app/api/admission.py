@@ -0,0 +1,212 @@
+"""Admission control for agent runs.
+
+Each run started through the CopilotKit endpoint holds a slot for as long as its event stream is
+open. ``AdmissionController`` caps the number of slots globally and per client and queues
+excess runs in FIFO order for a bounded time. Runs reach the backend through the CopilotKit
+runtime, so the peer address is the proxy's and says nothing about the user. A client is
+therefore only identified by a header that a trusted proxy sets (``AGENT_CLIENT_ID_HEADER``), and
+runs without one are only subject to the global limit. A run is rejected immediately with ``429`` when
+its client is over its own cap, and with ``503`` when the queue is full or the wait times out;
+both carry a ``Retry-After`` header.
+"""
+
+import asyncio
+import re
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from ..config import settings
+
+# Paths under the CopilotKit prefix that start an agent run (v1 and v2 protocol)
+_RUN_PATH = re.compile(r"/(agents/execute|agent/[A-Za-z0-9_-]+)/?$")
+
+
+class AdmissionRejected(Exception):
+    """Raised when a run cannot be admitted."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Global and per-client concurrency limits with a bounded FIFO wait queue.
+
+    Args:
+        max_concurrent: Runs allowed to execute at once.
+        max_per_client: Runs one identified client may have executing or queued at once.
+        max_queue: Runs allowed to wait for a slot; further runs are rejected.
+        queue_timeout: Seconds a queued run waits for a slot before it is rejected.
+        retry_after: Seconds suggested to rejected clients in the Retry-After header.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_client: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_per_client = max_per_client
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.active = 0
+        self._clients: Counter = Counter()
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+        self._waits: Deque[float] = deque(maxlen=1000)
+        self.max_wait = 0.0
+
+    async def acquire(self, client: Optional[str]) -> None:
+        """Wait for a slot for ``client`` (None if unidentified), raising ``AdmissionRejected`` if none
+        is granted."""
+        if client is not None and self._clients[client] >= self.max_per_client:
+            self.rejected["client_limit"] += 1
+            raise AdmissionRejected(429, "Too many concurrent agent runs for this client", self.retry_after)
+
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+        else:
+            if len(self._waiters) >= self.max_queue:
+                self.rejected["queue_full"] += 1
+                raise AdmissionRejected(503, "Agent is at capacity, try again later", self.retry_after)
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._join(client)
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                # Cancelled while queued: hand back the slot if it was granted in the meantime
+                if waiter.done() and not waiter.cancelled():
+                    self._release_slot()
+                raise
+            finally:
+                self._leave(client)
+                if not waiter.done():
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+            if waiter.cancelled():
+                self.rejected["queue_timeout"] += 1
+                raise AdmissionRejected(503, "Timed out waiting for agent capacity", self.retry_after)
+            wait = time.monotonic() - started
+            self._waits.append(wait)
+            self.max_wait = max(self.max_wait, wait)
+
+        self._join(client)
+        self.admitted += 1
+
+    def release(self, client: Optional[str]) -> None:
+        """Return the slot held by a run of ``client``."""
+        self._leave(client)
+        self._release_slot()
+
+    def _join(self, client: Optional[str]) -> None:
+        if client is not None:
+            self._clients[client] += 1
+
+    def _leave(self, client: Optional[str]) -> None:
+        if client is None:
+            return
+        self._clients[client] -= 1
+        if self._clients[client] <= 0:
+            del self._clients[client]
+
+    def _release_slot(self) -> None:
+        # Hand the slot straight to the oldest waiter so queued runs are admitted in order
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def metrics(self) -> Dict[str, object]:
+        """Current occupancy, queue depth, wait times and rejection counts."""
+        waits = sorted(self._waits)
+        return {
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_concurrent": self.max_concurrent,
+            "max_per_client": self.max_per_client,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_seconds": {
+                "samples": len(waits),
+                "mean": sum(waits) / len(waits) if waits else 0.0,
+                "p95": waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+                "max": self.max_wait,
+            },
+        }
+
+
+def client_key(scope: Scope, header: str) -> Optional[str]:
+    """Identify the caller by the trusted client id ``header``, or return None if it is not
+    configured or absent."""
+    if not header:
+        return None
+    name = header.lower().encode("latin-1")
+    for key, value in scope.get("headers", ()):
+        if key == name and value:
+            return value.decode("latin-1")
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware admitting agent runs under ``path`` through an ``AdmissionController``.
+
+    The slot is held until the downstream app has finished sending the (streamed) response.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, path: str, client_header: str = ""):
+        self.app = app
+        self.controller = controller
+        self.path = path.rstrip("/")
+        self.client_header = client_header
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self._is_run(scope):
+            await self.app(scope, receive, send)
+            return
+
+        client = client_key(scope, self.client_header)
+        try:
+            await self.controller.acquire(client)
+        except AdmissionRejected as exc:
+            response = JSONResponse(
+                {"detail": exc.detail}, status_code=exc.status_code, headers={"Retry-After": str(exc.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(client)
+
+    def _is_run(self, scope: Scope) -> bool:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return False
+        path: Optional[str] = scope.get("path")
+        return bool(path and path.startswith(self.path + "/") and _RUN_PATH.search(path[len(self.path) :]))
+
+
+admission = AdmissionController(
+    max_concurrent=settings.agent_max_concurrent_runs,
+    max_per_client=settings.agent_max_runs_per_client,
+    max_queue=settings.agent_queue_size,
+    queue_timeout=settings.agent_queue_timeout,
+    retry_after=settings.agent_retry_after,
+)
@@ -0,0 +1,158 @@
+"""HTTP validators, conditional requests and compression for read-only routes.
+
+``ConditionalRoute`` is used as the ``route_class`` of a router. Every GET response gets a weak
+ETag and a Last-Modified header derived from the database data version, and a matching
+``If-None-Match`` / ``If-Modified-Since`` request is answered with ``304 Not Modified``. Only a
+request that would succeed gets a 304: it is answered from the result cache when possible and
+otherwise rendered first, so a malformed request still gets its 400. Bodies above
+``settings.compression_min_size`` are compressed with zstd or gzip according to
+``Accept-Encoding``.
+
+Uncompressed 200 bodies are stored in the shared result cache (``app.utils.cache``) under their
+ETag, so with the ``sqlite`` cache backend each payload is computed once per container and
+other worker processes serve it without running the handler. An endpoint can set a
+``result_cache_ttl`` attribute: seconds to keep its results, or 0 to not cache them at all.
+Concurrent identical cache misses are coalesced: one handler call runs and every waiting request
+is answered from its result.
+"""
+
+import gzip
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Callable, Dict, Optional
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+
+from ..config import settings
+from ..db.database import data_last_modified, data_version
+from ..utils.cache import cache
+from ..utils.singleflight import SingleFlight
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd is optional
+    zstandard = None
+
+_COMPRESSORS: Dict[str, Callable[[bytes], bytes]] = {"gzip": lambda body: gzip.compress(body, compresslevel=6)}
+if zstandard is not None:
+    _COMPRESSORS["zstd"] = zstandard.ZstdCompressor(level=3).compress
+
+# Server preference when the client accepts several encodings with the same q-value
+_ENCODING_PREFERENCE = ("zstd", "gzip")
+
+
+def make_etag(version: str, request: Request) -> str:
+    """Build a weak ETag for ``request`` at the given data version.
+
+    The tag is weak because the same representation may be sent with different content codings.
+    Query parameters are sorted, so requests differing only in parameter order share a tag.
+    """
+    query = urlencode(sorted(request.query_params.multi_items()))
+    digest = hashlib.blake2b(f"{version}|{request.url.path}|{query}".encode(), digest_size=12)
+    return f'W/"{digest.hexdigest()}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: float) -> bool:
+    """Evaluate the request's conditional headers. If-None-Match takes precedence (RFC 9110)."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the best supported content coding from an Accept-Encoding header, if any."""
+    weights: Dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        weights[coding.strip().lower()] = q
+    candidates = [coding for coding in _ENCODING_PREFERENCE if coding in _COMPRESSORS]
+    ranked = sorted(
+        (coding for coding in candidates if weights.get(coding, weights.get("*", 0.0)) > 0),
+        key=lambda coding: -weights.get(coding, weights.get("*", 0.0)),
+    )
+    return ranked[0] if ranked else None
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    """Compress ``response.body`` in place if it is large enough and the client accepts it."""
+    response.headers.append("Vary", "Accept-Encoding")
+    body = getattr(response, "body", b"")
+    if len(body) < settings.compression_min_size or "content-encoding" in response.headers:
+        return response
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is None:
+        return response
+    response.body = _COMPRESSORS[encoding](body)
+    response.headers["Content-Encoding"] = encoding
+    response.headers["Content-Length"] = str(len(response.body))
+    return response
+
+
+class ConditionalRoute(APIRoute):
+    """Route that adds validators, 304 handling, result caching, Cache-Control and compression to GET responses."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        flights = SingleFlight()
+        cache_ttl = getattr(self.endpoint, "result_cache_ttl", None)
+
+        async def render(request: Request, cache_key: str) -> Response:
+            response = await handler(request)
+            cacheable = cache_ttl != 0 and response.status_code == 200 and response.media_type == "application/json"
+            if cacheable and response.body:
+                # The cache backend may be SQLite, whose calls block
+                await run_in_threadpool(cache.set, cache_key, bytes(response.body), cache_ttl)
+            return response
+
+        async def route_handler(request: Request) -> Response:
+            if request.method not in ("GET", "HEAD"):
+                return await handler(request)
+
+            last_modified = data_last_modified()
+            etag = make_etag(data_version(), request)
+            headers = {
+                "ETag": etag,
+                "Last-Modified": formatdate(last_modified, usegmt=True),
+                "Cache-Control": settings.insights_cache_control,
+            }
+            cache_key = f"http:{etag}"
+            cached = await run_in_threadpool(cache.get, cache_key) if cache_ttl != 0 else None
+            if cached is not None:
+                response = Response(content=cached, media_type="application/json")
+            else:
+                # Keyed like the cache: path, sorted query parameters and data version
+                shared = await flights.do(cache_key, lambda: render(request, cache_key))
+                # The shared response is copied, since headers and body are modified per request below
+                response = Response(content=shared.body, status_code=shared.status_code)
+                response.raw_headers = list(shared.raw_headers)
+                if response.status_code != 200:
+                    return response
+            if is_not_modified(request, etag, last_modified):
+                return Response(status_code=304, headers={**headers, "Vary": "Accept-Encoding"})
+            response.headers.update(headers)
+            return compress_response(request, response)
+
+        return route_handler
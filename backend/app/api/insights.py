@@ -1,7 +1,15 @@
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Literal, Optional
+
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import desc, distinct, func
+from sqlalchemy import Float, distinct, func, select, type_coerce
 from sqlalchemy.orm import Session
 
+from ..config import settings
+from ..db.aggregates import sales_buckets
+from ..db.approximate import ApproximateResult, SampleStore, sample_store
 from ..db.database import get_db
 from ..db.models import (
     Actor,
@@ -16,253 +24,294 @@ from ..db.models import (
     Rental,
     Store,
 )
+from .http_cache import ConditionalRoute
+from .registry import Insight, InsightRegistry, Keyset, Param, to_sql
+from .responses import Money
 
-router = APIRouter()
+if settings.insight_engine == "columnar":
+    from ..db.columnar import columnar_engine
+else:
+    columnar_engine = None
 
+# Route handlers are plain functions: FastAPI runs them in its threadpool, so queries do not
+# block the event loop and concurrent identical requests can be coalesced by ConditionalRoute.
+router = APIRouter(route_class=ConditionalRoute)
 
-@router.get("/insights")
-async def get_insights(db: Session = Depends(get_db)):
-    try:
-        # TODO: Implement insights generation logic
-        return {"status": "success", "insights": []}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
+def _float(expr):
+    """Have the driver return ``expr`` as a plain float instead of a ``Decimal``."""
+    return type_coerce(expr, Float)
 
-@router.get("/insights/top-films")
-async def get_top_films(limit: int = 10, db: Session = Depends(get_db)):
-    try:
-        # Get top films by rental count
-        top_films = (
-            db.query(
-                Film.title,
-                func.count(Rental.rental_id).label("rental_count"),
-                Film.rental_rate,
-                func.sum(Payment.amount).label("total_revenue"),
-            )
-            .join(Rental, Film.film_id == Rental.inventory_id)
-            .join(Payment, Rental.rental_id == Payment.rental_id)
-            .group_by(Film.film_id)
-            .order_by(desc("rental_count"))
-            .limit(limit)
-            .all()
-        )
 
-        return {
-            "status": "success",
-            "data": [
-                {
-                    "title": film.title,
-                    "rental_count": film.rental_count,
-                    "rental_rate": float(film.rental_rate),
-                    "total_revenue": float(film.total_revenue),
-                }
-                for film in top_films
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# Row shapes of the insight payloads
+@dataclass(slots=True)
+class TopFilmRow:
+    title: str
+    rental_count: int
+    rental_rate: Money
+    total_revenue: Money
 
 
-@router.get("/insights/category-performance")
-async def get_category_performance(db: Session = Depends(get_db)):
-    try:
-        # Get performance metrics by category
-        category_stats = (
-            db.query(
-                Category.name,
-                func.count(Film.film_id).label("film_count"),
-                func.avg(Film.rental_rate).label("avg_rental_rate"),
-                func.sum(Payment.amount).label("total_revenue"),
-            )
-            .join(Film, Category.category_id == Film.film_id)
-            .join(Rental, Film.film_id == Rental.inventory_id)
-            .join(Payment, Rental.rental_id == Payment.rental_id)
-            .group_by(Category.category_id)
-            .all()
-        )
+@dataclass(slots=True)
+class CategoryPerformanceRow:
+    category: str
+    film_count: int
+    avg_rental_rate: float
+    total_revenue: Money
 
-        return {
-            "status": "success",
-            "data": [
-                {
-                    "category": cat.name,
-                    "film_count": cat.film_count,
-                    "avg_rental_rate": float(cat.avg_rental_rate),
-                    "total_revenue": float(cat.total_revenue),
-                }
-                for cat in category_stats
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
+@dataclass(slots=True)
+class CustomerActivityRow:
+    customer_name: str
+    rental_count: int
+    total_spent: Money
 
-@router.get("/insights/customer-activity")
-async def get_customer_activity(limit: int = 10, db: Session = Depends(get_db)):
-    try:
-        # Get most active customers
-        active_customers = (
-            db.query(
-                Customer.first_name,
-                Customer.last_name,
-                func.count(Rental.rental_id).label("rental_count"),
-                func.sum(Payment.amount).label("total_spent"),
-            )
-            .join(Rental, Customer.customer_id == Rental.customer_id)
-            .join(Payment, Rental.rental_id == Payment.rental_id)
-            .group_by(Customer.customer_id)
-            .order_by(desc("total_spent"))
-            .limit(limit)
-            .all()
-        )
 
-        return {
-            "status": "success",
-            "data": [
-                {
-                    "customer_name": f"{cust.first_name} {cust.last_name}",
-                    "rental_count": cust.rental_count,
-                    "total_spent": float(cust.total_spent),
-                }
-                for cust in active_customers
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@dataclass(slots=True)
+class StorePerformanceRow:
+    store_id: int
+    rental_count: int
+    total_revenue: Money
+    avg_transaction: float
 
 
-@router.get("/insights/store-performance")
-async def get_store_performance(db: Session = Depends(get_db)):
-    try:
-        # Get store performance metrics
-        store_stats = (
-            db.query(
-                Store.store_id,
-                func.count(Rental.rental_id).label("rental_count"),
-                func.sum(Payment.amount).label("total_revenue"),
-                func.avg(Payment.amount).label("avg_transaction"),
-            )
-            .join(Rental, Store.store_id == Rental.staff_id)
-            .join(Payment, Rental.rental_id == Payment.rental_id)
-            .group_by(Store.store_id)
-            .all()
-        )
+@dataclass(slots=True)
+class ActorPopularityRow:
+    actor_name: str
+    rental_count: int
+    total_revenue: Money
 
-        return {
-            "status": "success",
-            "data": [
-                {
-                    "store_id": store.store_id,
-                    "rental_count": store.rental_count,
-                    "total_revenue": float(store.total_revenue),
-                    "avg_transaction": float(store.avg_transaction),
-                }
-                for store in store_stats
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
 
+@dataclass(slots=True)
+class SalesOverviewRow:
+    date: str
+    Sales: Money
+    Profit: Money
+    Expenses: Money
+    Customers: int
 
-@router.get("/insights/actor-popularity")
-async def get_actor_popularity(limit: int = 10, db: Session = Depends(get_db)):
-    try:
-        # Get most popular actors based on film rentals
-        popular_actors = (
-            db.query(
-                Actor.first_name,
-                Actor.last_name,
-                func.count(Rental.rental_id).label("rental_count"),
-                func.sum(Payment.amount).label("total_revenue"),
-            )
-            .join(Film, Actor.actor_id == Film.film_id)
-            .join(Rental, Film.film_id == Rental.inventory_id)
-            .join(Payment, Rental.rental_id == Payment.rental_id)
-            .group_by(Actor.actor_id)
-            .order_by(desc("rental_count"))
-            .limit(limit)
-            .all()
-        )
 
-        return {
-            "status": "success",
-            "data": [
-                {
-                    "actor_name": f"{actor.first_name} {actor.last_name}",
-                    "rental_count": actor.rental_count,
-                    "total_revenue": float(actor.total_revenue),
-                }
-                for actor in popular_actors
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+@dataclass(slots=True)
+class RegionalSalesRow:
+    region: str
+    sales: Money
+    marketShare: int
 
 
-@router.get("/insights/sales-overview")
-async def get_sales_overview(db: Session = Depends(get_db)):
-    try:
-        # Get monthly sales data for the past year
-        sales_data = (
-            db.query(
-                func.strftime("%Y-%m", Payment.payment_date).label("date"),
-                func.sum(Payment.amount).label("Sales"),
-                func.sum(Payment.amount * 0.7).label("Profit"),  # Assuming 70% profit margin
-                func.sum(Payment.amount * 0.3).label("Expenses"),  # Assuming 30% expenses
-                func.count(distinct(Rental.customer_id)).label("Customers"),
-            )
-            .join(Rental, Payment.rental_id == Rental.rental_id)
-            .group_by(func.strftime("%Y-%m", Payment.payment_date))
-            .order_by(func.strftime("%Y-%m", Payment.payment_date))
-            .limit(12)
-            .all()
+def _sales_overview(db: Session, granularity: str, start: Optional[date], end: Optional[date]):
+    # Served from the persisted buckets. Without a range, return the first 12 buckets.
+    limit = 12 if start is None and end is None else None
+    return sales_buckets.overview(granularity, start, end, limit)
+
+
+# The insights. With INSIGHT_ENGINE=columnar, insights without a ``compute`` function are
+# answered by the in-memory engine in app.db.columnar instead of their statement; it returns
+# identically labelled rows. Insights aggregating the fact tables into a few large groups can
+# also be estimated from samples; per-film, customer or actor rankings cannot, as each of those
+# groups has too few sampled rows to be ranked reliably.
+registry = InsightRegistry(engine=columnar_engine, samples=sample_store)
+
+# Top films by rental count
+_film_rentals = func.count(Rental.rental_id)
+registry.register(
+    Insight(
+        name="top_films",
+        path="/insights/top-films",
+        description="Films ranked by number of rentals, with rental rate and revenue",
+        row_type=TopFilmRow,
+        cost="moderate",
+        statement=select(
+            Film.film_id,
+            Film.title,
+            _film_rentals.label("rental_count"),
+            _float(Film.rental_rate).label("rental_rate"),
+            _float(func.sum(Payment.amount)).label("total_revenue"),
         )
+        .join(Rental, Film.film_id == Rental.inventory_id)
+        .join(Payment, Rental.rental_id == Payment.rental_id)
+        .group_by(Film.film_id),
+        keyset=Keyset(_film_rentals, Film.film_id, "rental_count", "film_id"),
+    )
+)
 
-        return {
-            "status": "success",
-            "data": [
-                {
-                    "date": sale.date,
-                    "Sales": float(sale.Sales),
-                    "Profit": float(sale.Profit),
-                    "Expenses": float(sale.Expenses),
-                    "Customers": sale.Customers,
-                }
-                for sale in sales_data
-            ],
-        }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+# Performance metrics by category
+registry.register(
+    Insight(
+        name="category_performance",
+        path="/insights/category-performance",
+        description="Film count, average rental rate and revenue per category",
+        row_type=CategoryPerformanceRow,
+        cost="moderate",
+        statement=select(
+            Category.name.label("category"),
+            func.count(Film.film_id).label("film_count"),
+            _float(func.avg(Film.rental_rate)).label("avg_rental_rate"),
+            _float(func.sum(Payment.amount)).label("total_revenue"),
+        )
+        .join(Film, Category.category_id == Film.film_id)
+        .join(Rental, Film.film_id == Rental.inventory_id)
+        .join(Payment, Rental.rental_id == Payment.rental_id)
+        .group_by(Category.category_id),
+    )
+)
 
+# Most active customers. The rank key is rounded so that the value echoed back in the cursor
+# compares equal to the one computed in SQL.
+_total_spent = _float(func.round(func.sum(Payment.amount), 2))
+registry.register(
+    Insight(
+        name="customer_activity",
+        path="/insights/customer-activity",
+        description="Customers ranked by total amount spent, with rental count",
+        row_type=CustomerActivityRow,
+        cost="moderate",
+        statement=select(
+            Customer.customer_id,
+            (Customer.first_name + " " + Customer.last_name).label("customer_name"),
+            func.count(Rental.rental_id).label("rental_count"),
+            _total_spent.label("total_spent"),
+        )
+        .join(Rental, Customer.customer_id == Rental.customer_id)
+        .join(Payment, Rental.rental_id == Payment.rental_id)
+        .group_by(Customer.customer_id),
+        keyset=Keyset(_total_spent, Customer.customer_id, "total_spent", "customer_id"),
+    )
+)
 
-@router.get("/insights/regional-sales")
-async def get_regional_sales(db: Session = Depends(get_db)):
-    try:
-        # Get sales data by country
-        regional_data = (
-            db.query(
-                Country.country.label("region"),
-                func.sum(Payment.amount).label("sales"),
-                func.count(distinct(Rental.customer_id)).label("marketShare"),
-            )
-            .join(City, Country.country_id == City.country_id)
-            .join(Address, City.city_id == Address.city_id)
-            .join(Store, Address.address_id == Store.address_id)
-            .join(Inventory, Store.store_id == Inventory.store_id)
-            .join(Rental, Inventory.inventory_id == Rental.inventory_id)
-            .join(Payment, Rental.rental_id == Payment.rental_id)
-            .group_by(Country.country)
-            .order_by(func.sum(Payment.amount).desc())
-            .all()
+# Store performance metrics
+registry.register(
+    Insight(
+        name="store_performance",
+        path="/insights/store-performance",
+        description="Rental count, revenue and average transaction per store",
+        row_type=StorePerformanceRow,
+        cost="moderate",
+        approximate=True,
+        statement=select(
+            Store.store_id,
+            func.count(Rental.rental_id).label("rental_count"),
+            _float(func.sum(Payment.amount)).label("total_revenue"),
+            _float(func.avg(Payment.amount)).label("avg_transaction"),
+        )
+        .join(Rental, Store.store_id == Rental.staff_id)
+        .join(Payment, Rental.rental_id == Payment.rental_id)
+        .group_by(Store.store_id),
+    )
+)
+
+# Most popular actors based on film rentals
+_actor_rentals = func.count(Rental.rental_id)
+registry.register(
+    Insight(
+        name="actor_popularity",
+        path="/insights/actor-popularity",
+        description="Actors ranked by rentals of their films, with revenue",
+        row_type=ActorPopularityRow,
+        cost="moderate",
+        statement=select(
+            Actor.actor_id,
+            (Actor.first_name + " " + Actor.last_name).label("actor_name"),
+            _actor_rentals.label("rental_count"),
+            _float(func.sum(Payment.amount)).label("total_revenue"),
+        )
+        .join(Film, Actor.actor_id == Film.film_id)
+        .join(Rental, Film.film_id == Rental.inventory_id)
+        .join(Payment, Rental.rental_id == Payment.rental_id)
+        .group_by(Actor.actor_id),
+        keyset=Keyset(_actor_rentals, Actor.actor_id, "rental_count", "actor_id"),
+    )
+)
+
+# Sales, profit, expenses and customers per period. The route serves the precomputed buckets in
+# app.db.aggregates; the statement (monthly, first 12 months) is the reference they are checked against.
+_month = func.strftime("%Y-%m", Payment.payment_date)
+registry.register(
+    Insight(
+        name="sales_overview",
+        path="/insights/sales-overview",
+        description="Sales, profit, expenses and distinct customers per day, week or month",
+        row_type=SalesOverviewRow,
+        cost="cheap",
+        statement=select(
+            _month.label("date"),
+            _float(func.sum(Payment.amount)).label("Sales"),
+            _float(func.sum(Payment.amount * 0.7)).label("Profit"),  # Assuming 70% profit margin
+            _float(func.sum(Payment.amount * 0.3)).label("Expenses"),  # Assuming 30% expenses
+            func.count(distinct(Rental.customer_id)).label("Customers"),
         )
+        .join(Rental, Payment.rental_id == Rental.rental_id)
+        .group_by(_month)
+        .order_by(_month)
+        .limit(12),
+        params=(
+            Param("granularity", Literal["day", "week", "month"], "month", "Bucket size"),
+            Param("start", Optional[date], None, "First day to include", alias="from"),
+            Param("end", Optional[date], None, "Last day to include", alias="to"),
+        ),
+        compute=_sales_overview,
+    )
+)
+
+# Sales by country. Distinct customers do not scale up from a sample, so the estimate takes
+# sales from the samples and customers from the per-store sketches (which count customers of all
+# rentals, including the few without a payment).
+_regional_sales = (
+    select(
+        Country.country.label("region"),
+        _float(func.sum(Payment.amount)).label("sales"),
+    )
+    .join(City, Country.country_id == City.country_id)
+    .join(Address, City.city_id == Address.city_id)
+    .join(Store, Address.address_id == Store.address_id)
+    .join(Inventory, Store.store_id == Inventory.store_id)
+    .join(Rental, Inventory.inventory_id == Rental.inventory_id)
+    .join(Payment, Rental.rental_id == Payment.rental_id)
+    .group_by(Country.country)
+    .order_by(func.sum(Payment.amount).desc())
+)
+_regional_sales_sql = to_sql(_regional_sales)
+
+
+def _estimate_regional_sales(samples: SampleStore, db: Session, params: Dict[str, Any]) -> ApproximateResult:
+    result = samples.query(_regional_sales_sql)
+    if not result.approximate:
+        return result
+    stores = defaultdict(list)
+    store_countries = (
+        select(Country.country, Store.store_id)
+        .join(City, Country.country_id == City.country_id)
+        .join(Address, City.city_id == Address.city_id)
+        .join(Store, Address.address_id == Store.address_id)
+    )
+    for region, store_id in db.execute(store_countries):
+        stores[region].append(store_id)
+    result.add_column(
+        "marketShare", [samples.distinct("rental.customer_id", "store", stores[row[0]]) for row in result.rows]
+    )
+    return result
+
+
+registry.register(
+    Insight(
+        name="regional_sales",
+        path="/insights/regional-sales",
+        description="Sales and distinct customers per country of the renting store",
+        row_type=RegionalSalesRow,
+        cost="expensive",
+        statement=_regional_sales.add_columns(func.count(distinct(Rental.customer_id)).label("marketShare")),
+        approximate=True,
+        estimate=_estimate_regional_sales,
+    )
+)
 
-        return {
-            "status": "success",
-            "data": [
-                {"region": region.region, "sales": float(region.sales), "marketShare": region.marketShare}
-                for region in regional_data
-            ],
-        }
+
+@router.get("/insights")
+def get_insights(db: Session = Depends(get_db)):
+    try:
+        # TODO: Implement insights generation logic
+        return {"status": "success", "insights": []}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+registry.add_routes(router)
@@ -0,0 +1,57 @@
+"""Keyset (cursor) pagination for ranked insight endpoints.
+
+A cursor is an opaque, URL-safe token encoding the rank key and id of the last row of a page.
+The next page continues strictly after that position in ``ORDER BY rank DESC, id ASC`` order,
+so pages are stable: rows inserted ahead of the cursor neither repeat nor skip rows. The rank is
+an aggregate, so the position is filtered in ``HAVING``, after the full GROUP BY: every page,
+deep ones included, still aggregates the whole fact table, and costs about the same as the first.
+Only the sort and the rows sent are bounded by the page. The columnar engine answers the same
+pages from memory (``INSIGHT_ENGINE=columnar``).
+"""
+
+import base64
+import binascii
+from typing import Any, Optional, Sequence, Tuple
+
+import orjson
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Largest page a client may request
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(rank: Any, row_id: int) -> str:
+    """Encode the position of a row as an opaque cursor."""
+    return base64.urlsafe_b64encode(orjson.dumps([rank, row_id])).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Decode a cursor produced by ``encode_cursor``. Raises a 400 error if it is malformed."""
+    try:
+        rank, row_id = orjson.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(row_id, int) or not isinstance(rank, (int, float)):
+            raise ValueError(cursor)
+    except (binascii.Error, orjson.JSONDecodeError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+    return rank, row_id
+
+
+def after_cursor(rank_expr, id_expr, position: Optional[Tuple[Any, int]]):
+    """Return the condition selecting rows ranked after a decoded cursor, or None for the first page.
+
+    ``rank_expr`` is usually an aggregate, so the condition belongs in ``HAVING`` and is applied
+    after grouping every row.
+    """
+    if position is None:
+        return None
+    rank, row_id = position
+    return or_(rank_expr < rank, and_(rank_expr == rank, id_expr > row_id))
+
+
+def next_cursor(rows: Sequence[Any], limit: int, rank_attr: str, id_attr: str) -> Optional[str]:
+    """Return the cursor for the page following ``rows``, or None if this was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, rank_attr), getattr(last, id_attr))
@@ -1,17 +1,72 @@
-from typing import Any, Dict
+import importlib.util
+import sqlite3
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
-from ..db.database import get_db
+from ..config import settings
+from ..db.database import connect_readonly
+from ..utils.export import (
+    ARROW_STREAM_MEDIA_TYPE,
+    NDJSON_MEDIA_TYPE,
+    iter_arrow,
+    iter_ndjson,
+)
 
 router = APIRouter()
 
 
+class QueryRequest(BaseModel):
+    query: str = Field(..., description="A single read-only SQL statement")
+    batch_size: Optional[int] = Field(None, gt=0, le=100_000, description="Rows per streamed chunk")
+
+
+def negotiate_export_format(accept: Optional[str]) -> str:
+    """Pick the export media type from an Accept header. NDJSON is the default."""
+    for item in (accept or "*/*").split(","):
+        media_type = item.split(";")[0].strip().lower()
+        if media_type == ARROW_STREAM_MEDIA_TYPE:
+            if importlib.util.find_spec("pyarrow") is None:
+                raise HTTPException(status_code=406, detail="Arrow export requires the pyarrow package")
+            return ARROW_STREAM_MEDIA_TYPE
+        if media_type in (NDJSON_MEDIA_TYPE, "application/json", "application/*", "*/*"):
+            return NDJSON_MEDIA_TYPE
+    raise HTTPException(status_code=406, detail=f"Supported formats: {NDJSON_MEDIA_TYPE}, {ARROW_STREAM_MEDIA_TYPE}")
+
+
+def _execute(query: str) -> sqlite3.Cursor:
+    conn = connect_readonly()
+    try:
+        return conn.execute(query)
+    except Exception:
+        conn.close()
+        raise
+
+
+def _stream_and_close(chunks, cursor: sqlite3.Cursor):
+    try:
+        yield from chunks
+    finally:
+        cursor.connection.close()
+
+
 @router.post("/query")
-async def process_query(query: Dict[str, Any], db: Session = Depends(get_db)):
+async def process_query(request: QueryRequest, accept: Optional[str] = Header(None)):
+    """Execute read-only SQL and stream the result set as NDJSON or Arrow IPC.
+
+    Rows are fetched lazily in batches while the response is written. Starlette only pulls the
+    next batch once the previous chunk has been handed to the server, so a slow client throttles
+    the fetch loop instead of growing a buffer.
+    """
+    media_type = negotiate_export_format(accept)
+    batch_size = request.batch_size or settings.export_batch_size
     try:
-        # TODO: Implement query processing logic
-        return {"status": "success", "message": "Query received"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        cursor = await run_in_threadpool(_execute, request.query)
+    except sqlite3.Error as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    encode = iter_arrow if media_type == ARROW_STREAM_MEDIA_TYPE else iter_ndjson
+    return StreamingResponse(_stream_and_close(encode(cursor, batch_size), cursor), media_type=media_type)
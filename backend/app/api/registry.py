@@ -0,0 +1,301 @@
+"""Declarative registry of insights.
+
+Each insight is declared once as an ``Insight``: its SQL statement, request parameters, output
+row type and cost class. The registry generates the HTTP route for every insight, runs it for
+the agent's fast path, and is what the benchmarks iterate over.
+
+Statements are SQLAlchemy ``Select`` objects built once at import, with bound parameters for
+the page size and the keyset cursor. Their structure never changes between calls, so after the
+first execution SQLAlchemy serves the compiled SQL from the engine's compiled cache instead of
+rebuilding and recompiling an ORM query per request.
+
+Insights declared ``approximate`` also accept ``?approximate=true``: the first page is then
+estimated from the fact table samples of ``app.db.approximate``, with 95% confidence intervals.
+"""
+
+import inspect
+from dataclasses import dataclass, field, fields
+from types import SimpleNamespace
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+)
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import Field, TypeAdapter, ValidationError
+from sqlalchemy import Integer, Select, bindparam, desc
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import Session
+
+from ..db.approximate import CONFIDENCE, ApproximateResult, SampleStore
+from ..db.database import get_db
+from .pagination import MAX_PAGE_SIZE, after_cursor, decode_cursor, next_cursor
+from .responses import JSONBytesResponse, RowAdapter
+
+# How expensive an insight is to compute. "cheap" insights read precomputed data and are not
+# stored in the result cache; the others are cached per data version.
+CostClass = Literal["cheap", "moderate", "expensive"]
+
+
+def to_sql(statement: Select) -> str:
+    """``statement`` as SQLite SQL with its parameters inlined."""
+    return str(statement.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+@dataclass(frozen=True)
+class Param:
+    """A request parameter of an insight, optionally bounded by ``ge`` and ``le``."""
+
+    name: str
+    annotation: Any
+    default: Any = None
+    description: str = ""
+    alias: Optional[str] = None
+    ge: Optional[int] = None
+    le: Optional[int] = None
+
+    def validate(self, value: Any) -> Any:
+        return TypeAdapter(Annotated[self.annotation, Field(ge=self.ge, le=self.le)]).validate_python(value)
+
+
+@dataclass(frozen=True)
+class Keyset:
+    """Keyset pagination of an insight: rows are ranked by ``rank DESC, id ASC``.
+
+    ``rank`` and ``id`` are the SQL expressions, ``rank_label`` and ``id_label`` the names of the
+    result columns carrying them (used to build the next cursor).
+    """
+
+    rank: Any
+    id: Any
+    rank_label: str
+    id_label: str
+
+
+@dataclass
+class Insight:
+    """One insight and everything needed to serve it.
+
+    Args:
+        name: Identifier, also the method name on the columnar engine.
+        path: Route path.
+        description: One-line summary for the API docs and the agent.
+        row_type: Slotted dataclass describing one output row.
+        cost: Cost class, see ``CostClass``.
+        statement: Grouped ``Select`` producing the rows. Paged insights leave ordering and
+            LIMIT to the registry; unpaged ones are complete statements.
+        keyset: Pagination, for ranked insights served a page at a time.
+        params: Request parameters besides the page size and cursor of paged insights.
+        compute: Produces the rows instead of the statement, e.g. from precomputed data. The
+            statement, if any, is then only the reference the benchmarks check against.
+        approximate: Whether the insight can be estimated from the fact table samples, adding
+            an ``approximate`` parameter.
+        estimate: Produces the estimate instead of running the statement on the samples, for
+            insights the samples alone cannot answer; called with the sample store, the session
+            and the bound parameters.
+    """
+
+    name: str
+    path: str
+    description: str
+    row_type: Type
+    cost: CostClass
+    statement: Optional[Select] = None
+    keyset: Optional[Keyset] = None
+    params: Tuple[Param, ...] = ()
+    compute: Optional[Callable[..., List[Any]]] = None
+    approximate: bool = False
+    estimate: Optional[Callable[..., ApproximateResult]] = None
+    adapter: RowAdapter = field(init=False)
+    _first_page: Optional[Select] = field(init=False, default=None)
+    _next_page: Optional[Select] = field(init=False, default=None)
+
+    def __post_init__(self):
+        self.adapter = RowAdapter(self.row_type)
+        if self.keyset is not None:
+            self.params = (
+                Param("limit", int, 10, "Rows per page", ge=1, le=MAX_PAGE_SIZE),
+                Param("cursor", Optional[str], None, "Cursor from the previous page's next_cursor"),
+                *self.params,
+            )
+            rank, row_id = self.keyset.rank, self.keyset.id
+            position = (bindparam("after_rank"), bindparam("after_id"))
+            ordered = (desc(self.keyset.rank_label), row_id)
+            limit = bindparam("limit", type_=Integer)
+            self._first_page = self.statement.order_by(*ordered).limit(limit)
+            self._next_page = (
+                self.statement.having(after_cursor(rank, row_id, position)).order_by(*ordered).limit(limit)
+            )
+        if self.approximate:
+            self.params = (
+                *self.params,
+                Param("approximate", bool, False, "Estimate from samples, with 95% confidence intervals"),
+            )
+
+    def bind(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate ``values`` against the declared parameters, filling in defaults."""
+        bound = {}
+        for param in self.params:
+            value = values.get(param.name, values.get(param.alias, param.default))
+            bound[param.name] = param.default if value is None else param.validate(value)
+        return bound
+
+    def run_sql(self, db: Session, limit: Optional[int] = None, position=None) -> List[Any]:
+        """Execute the statement, one keyset page at a time for paged insights."""
+        if self.keyset is None:
+            return db.execute(self.statement).all()
+        if position is None:
+            return db.execute(self._first_page, {"limit": limit}).all()
+        rank, row_id = position
+        return db.execute(self._next_page, {"limit": limit, "after_rank": rank, "after_id": row_id}).all()
+
+    def sql(self, limit: Optional[int] = None) -> str:
+        """The statement, or its first page, as SQLite SQL with the parameters inlined."""
+        return to_sql(self.statement if self.keyset is None else self._first_page.params(limit=limit))
+
+
+class InsightRegistry:
+    """The declared insights, by name.
+
+    Args:
+        engine: Optional in-memory engine answering insights by name instead of SQL (the
+            columnar engine); it must have a method per insight taking ``(limit, position)`` for
+            paged insights and no arguments otherwise.
+        samples: Sample store answering ``approximate`` requests.
+    """
+
+    def __init__(self, engine: Any = None, samples: Optional[SampleStore] = None):
+        self.engine = engine
+        self.samples = samples
+        self._insights: Dict[str, Insight] = {}
+
+    def register(self, insight: Insight) -> Insight:
+        if insight.name in self._insights:
+            raise ValueError(f"Insight {insight.name!r} is already registered")
+        self._insights[insight.name] = insight
+        return insight
+
+    def __iter__(self) -> Iterator[Insight]:
+        return iter(self._insights.values())
+
+    def __getitem__(self, name: str) -> Insight:
+        return self._insights[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._insights
+
+    def fetch(self, insight: Insight, db: Session, params: Dict[str, Any], position=None) -> List[Any]:
+        """Produce the rows of ``insight`` for bound ``params``."""
+        if insight.compute is not None:
+            return insight.compute(db, **params)
+        paged = insight.keyset is not None
+        if self.engine is not None:
+            method = getattr(self.engine, insight.name)
+            return method(params["limit"], position) if paged else method()
+        return insight.run_sql(db, params["limit"], position) if paged else insight.run_sql(db)
+
+    def render(self, insight: Insight, db: Session, params: Dict[str, Any]) -> bytes:
+        """Produce the encoded ``{"status": "success", "data": [...]}`` payload of ``insight``.
+
+        With ``approximate`` set and no cursor, the payload is the estimate of ``render_estimate``
+        when the samples can answer the insight. Raises a 400 error for a malformed cursor and a
+        500 error if the insight fails.
+        """
+        keyset = insight.keyset
+        position = decode_cursor(params["cursor"]) if keyset is not None and params["cursor"] else None
+        try:
+            if params.get("approximate") and position is None and self.samples is not None:
+                payload = self.render_estimate(insight, db, params)
+                if payload is not None:
+                    return payload
+            rows = self.fetch(insight, db, params, position)
+            if keyset is None:
+                return insight.adapter.encode(rows)
+            cursor = next_cursor(rows, params["limit"], keyset.rank_label, keyset.id_label)
+            return insight.adapter.encode(rows, next_cursor=cursor)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    def render_estimate(self, insight: Insight, db: Session, params: Dict[str, Any]) -> Optional[bytes]:
+        """Encode the estimate of ``insight`` (its first page, for paged insights), or return None
+        if the samples cannot answer it and the insight has to be computed exactly.
+
+        Estimated rows carry point estimates; the payload adds ``approximate``, ``confidence``,
+        ``sample_rate`` and, per row, the ``intervals`` of the estimated columns.
+        """
+        if insight.estimate is not None:
+            result = insight.estimate(self.samples, db, params)
+        else:
+            result = self.samples.query(insight.sql(params.get("limit")))
+        if not result.approximate:
+            return None
+        integers = {f.name for f in fields(insight.row_type) if f.type is int}
+        rows = [
+            SimpleNamespace(
+                **{
+                    column: round(value) if column in integers and isinstance(value, float) else value
+                    for column, value in zip(result.columns, row)
+                }
+            )
+            for row in result.rows
+        ]
+        intervals = [
+            {column: [round(low, 2), round(high, 2)] for column, (low, high) in interval.items()}
+            for interval in result.intervals
+        ]
+        return insight.adapter.encode(
+            rows, approximate=True, confidence=CONFIDENCE, sample_rate=result.sample_rate, intervals=intervals
+        )
+
+    def render_values(self, name: str, db: Session, values: Dict[str, Any]) -> bytes:
+        """Like ``render``, for an insight looked up by name with unvalidated parameter values."""
+        insight = self._insights[name]
+        try:
+            params = insight.bind(values)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return self.render(insight, db, params)
+
+    def add_routes(self, router: APIRouter) -> None:
+        """Add a GET route for every registered insight to ``router``."""
+        for insight in self:
+            endpoint = self._endpoint(insight)
+            router.add_api_route(
+                insight.path,
+                endpoint,
+                methods=["GET"],
+                response_class=JSONBytesResponse,
+                name=insight.name,
+                summary=insight.description,
+            )
+
+    def _endpoint(self, insight: Insight) -> Callable:
+        def endpoint(db: Session = Depends(get_db), **params):
+            return JSONBytesResponse(self.render(insight, db, params))
+
+        # FastAPI reads the query parameters from the signature
+        query_params = [
+            inspect.Parameter(
+                param.name,
+                inspect.Parameter.KEYWORD_ONLY,
+                default=Query(
+                    param.default, alias=param.alias, description=param.description, ge=param.ge, le=param.le
+                ),
+                annotation=param.annotation,
+            )
+            for param in insight.params
+        ]
+        db_param = inspect.Parameter("db", inspect.Parameter.KEYWORD_ONLY, default=Depends(get_db), annotation=Session)
+        endpoint.__signature__ = inspect.Signature([*query_params, db_param])
+        endpoint.__name__ = f"get_{insight.name}"
+        # Read by ConditionalRoute: cheap insights are recomputed rather than cached
+        endpoint.result_cache_ttl = 0 if insight.cost == "cheap" else None
+        return endpoint
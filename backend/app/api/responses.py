@@ -0,0 +1,79 @@
+"""Fast JSON serialization for API responses.
+
+Handlers map result rows onto slotted dataclasses through a ``RowAdapter`` and encode the
+payload once with orjson, which serializes dataclasses natively. The resulting bytes are sent
+as-is by ``JSONBytesResponse``, bypassing FastAPI's ``jsonable_encoder`` pass, and can be stored
+and served again later without re-encoding.
+
+Fields annotated ``Money`` are rounded to cents, as SQLAlchemy rounded the ``Numeric(..., 2)``
+values the handlers used to receive: sums of floats otherwise carry noise like
+51.870000000000005.
+"""
+
+from dataclasses import fields
+from decimal import Decimal
+from operator import attrgetter
+from typing import Annotated, Any, Generic, Iterable, List, Type, TypeVar
+
+import orjson
+from fastapi.responses import Response
+
+T = TypeVar("T")
+
+# An amount of money, or a sum of amounts: a float rounded to 2 decimals on output
+Money = Annotated[float, "money"]
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode ``content`` to JSON bytes. Dataclasses, numpy values and Decimals are supported."""
+    return orjson.dumps(content, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+class RowAdapter(Generic[T]):
+    """Maps result rows to instances of a dataclass describing the JSON shape of one row.
+
+    Values are read from the row by attribute name, so query columns must be labelled after
+    the dataclass fields. Rows may carry extra columns (ids used for pagination, for example).
+    ``Money`` fields are rounded to 2 decimals.
+    """
+
+    def __init__(self, row_type: Type[T]):
+        self.row_type = row_type
+        self.fields = tuple(f.name for f in fields(row_type))
+        self.money = tuple(i for i, f in enumerate(fields(row_type)) if f.type == Money)
+        getter = attrgetter(*self.fields)
+        self._values = getter if len(self.fields) > 1 else lambda row: (getter(row),)
+
+    def adapt(self, rows: Iterable[Any]) -> List[T]:
+        make, values, money = self.row_type, self._values, self.money
+        if not money:
+            return [make(*values(row)) for row in rows]
+        adapted = []
+        for row in rows:
+            row_values = list(values(row))
+            for i in money:
+                if row_values[i] is not None:
+                    row_values[i] = round(row_values[i], 2)
+            adapted.append(make(*row_values))
+        return adapted
+
+    def encode(self, rows: Iterable[Any], **extra: Any) -> bytes:
+        """Encode rows into the standard ``{"status": "success", "data": [...]}`` payload."""
+        return dumps({"status": "success", **extra, "data": self.adapt(rows)})
+
+
+class JSONBytesResponse(Response):
+    """JSON response whose body is either pre-encoded bytes or a value encoded with orjson."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, (bytes, bytearray, memoryview)):
+            return bytes(content)
+        return dumps(content)
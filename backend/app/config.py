@@ -0,0 +1,202 @@
+"""Runtime settings for the backend, read from environment variables."""
+
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass, field
+
+
+def _env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def _env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.strip().lower() in ("1", "true", "yes", "on") if value else default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Backend settings. Each field can be overridden with the matching environment variable."""
+
+    export_batch_size: int = field(
+        default_factory=lambda: _env_int("EXPORT_BATCH_SIZE", 1000),
+        metadata={
+            "description": "Number of rows fetched from SQLite and written to the client per chunk "
+            "when streaming /query exports. Bounds the memory used by a single export."
+        },
+    )
+
+    insights_cache_control: str = field(
+        default_factory=lambda: os.getenv("INSIGHTS_CACHE_CONTROL", "public, max-age=0, must-revalidate"),
+        metadata={"description": "Cache-Control header sent with insight responses."},
+    )
+
+    compression_min_size: int = field(
+        default_factory=lambda: _env_int("COMPRESSION_MIN_SIZE", 1024),
+        metadata={"description": "Insight response bodies smaller than this many bytes are sent uncompressed."},
+    )
+
+    snapshot_mode: bool = field(
+        default_factory=lambda: _env_bool("SNAPSHOT_MODE", False),
+        metadata={
+            "description": "Serve reads from a shared in-memory copy of the SQLite database, loaded at startup "
+            "and refreshed when the file changes. Trades memory for lower, steadier read latency."
+        },
+    )
+
+    snapshot_refresh_interval: float = field(
+        default_factory=lambda: _env_float("SNAPSHOT_REFRESH_INTERVAL", 30.0),
+        metadata={"description": "Seconds between checks of the database file for changes in snapshot mode."},
+    )
+
+    insight_engine: str = field(
+        default_factory=lambda: os.getenv("INSIGHT_ENGINE", "sql"),
+        metadata={
+            "description": "Engine answering the insight endpoints: 'sql' runs the SQLAlchemy queries, 'columnar' "
+            "serves them from in-memory NumPy column arrays (app.db.columnar)."
+        },
+    )
+
+    aggregates_path: str = field(
+        default_factory=lambda: os.getenv("AGGREGATES_PATH", ""),
+        metadata={
+            "description": "SQLite file holding precomputed insight aggregates such as the sales-overview buckets. "
+            "Defaults to insight-aggregates.db next to the database."
+        },
+    )
+    cache_backend: str = field(
+        default_factory=lambda: os.getenv("CACHE_BACKEND", "memory"),
+        metadata={
+            "description": "Where computed insight payloads and schema digests are cached: 'memory' keeps them per "
+            "process, 'sqlite' shares them between all worker processes through a SQLite file (CACHE_PATH)."
+        },
+    )
+
+    cache_path: str = field(
+        default_factory=lambda: os.getenv("CACHE_PATH", ""),
+        metadata={"description": "SQLite file used by the 'sqlite' cache backend. Defaults to a file in the temp dir."},
+    )
+
+    cache_ttl: float = field(
+        default_factory=lambda: _env_float("CACHE_TTL", 3600.0),
+        metadata={"description": "Seconds an unused cache entry is kept. Entries are keyed by data version."},
+    )
+
+    workers: int = field(
+        default_factory=lambda: _env_int("WEB_CONCURRENCY", 1),
+        metadata={"description": "Number of uvicorn worker processes started by `python -m app.main`."},
+    )
+
+    admin_token: str = field(
+        default_factory=lambda: os.getenv("ADMIN_TOKEN", ""),
+        metadata={
+            "description": "Bearer token required by the /api/v1/admin routes. Empty (the default) turns the admin "
+            "routes off."
+        },
+    )
+    agent_max_concurrent_runs: int = field(
+        default_factory=lambda: _env_int("AGENT_MAX_CONCURRENT_RUNS", 16),
+        metadata={"description": "Agent runs allowed to execute at once in this process."},
+    )
+
+    agent_max_runs_per_client: int = field(
+        default_factory=lambda: _env_int("AGENT_MAX_RUNS_PER_CLIENT", 4),
+        metadata={
+            "description": "Agent runs one client, identified by AGENT_CLIENT_ID_HEADER, may have executing or "
+            "queued at once. Further runs get 429."
+        },
+    )
+
+    agent_client_id_header: str = field(
+        default_factory=lambda: os.getenv("AGENT_CLIENT_ID_HEADER", ""),
+        metadata={
+            "description": "Request header carrying a per-user id that the proxy in front of the backend sets, "
+            "replacing any value the caller sent. Runs with it are limited per client; without it, or when this "
+            "is empty (the default), only the global limit applies. The peer address is never used, since every "
+            "run arrives through the CopilotKit runtime."
+        },
+    )
+
+    agent_queue_size: int = field(
+        default_factory=lambda: _env_int("AGENT_QUEUE_SIZE", 32),
+        metadata={"description": "Agent runs allowed to wait for a free slot. Further runs get 503."},
+    )
+
+    agent_queue_timeout: float = field(
+        default_factory=lambda: _env_float("AGENT_QUEUE_TIMEOUT", 10.0),
+        metadata={"description": "Seconds a queued agent run waits for a slot before it is rejected with 503."},
+    )
+
+    agent_retry_after: int = field(
+        default_factory=lambda: _env_int("AGENT_RETRY_AFTER", 5),
+        metadata={"description": "Retry-After seconds sent with rejected agent runs."},
+    )
+    agent_thread_token_budget: int = field(
+        default_factory=lambda: _env_int("AGENT_THREAD_TOKEN_BUDGET", 200_000),
+        metadata={
+            "description": "Prompt plus completion tokens one conversation thread may use. Once spent, the agent "
+            "ends the run with a short notice instead of calling the model. 0 disables the budget."
+        },
+    )
+
+    agent_run_time_budget: float = field(
+        default_factory=lambda: _env_float("AGENT_RUN_TIME_BUDGET", 300.0),
+        metadata={
+            "description": "Wall-clock seconds one agent run (a user turn) may take before it is ended at the next "
+            "model step. 0 disables the budget."
+        },
+    )
+    agent_summary_threshold: int = field(
+        default_factory=lambda: _env_int("AGENT_SUMMARY_THRESHOLD", 200),
+        metadata={
+            "description": "run_query results with more rows than this are returned to the model as column "
+            "profiles plus a row sample instead of in full. 0 always returns full results."
+        },
+    )
+
+    agent_summary_sample_rows: int = field(
+        default_factory=lambda: _env_int("AGENT_SUMMARY_SAMPLE_ROWS", 10),
+        metadata={"description": "Rows included in a summarized run_query result."},
+    )
+
+    agent_max_parallel_tasks: int = field(
+        default_factory=lambda: _env_int("AGENT_MAX_PARALLEL_TASKS", 4),
+        metadata={
+            "description": "Most independent sub-questions a compound question is split into and answered in "
+            "parallel branches. 0 or 1 disables planning, so every question goes through the tool loop."
+        },
+    )
+
+    agent_max_threads: int = field(
+        default_factory=lambda: _env_int("AGENT_MAX_THREADS", 1000),
+        metadata={
+            "description": "Conversation threads whose checkpoints are kept in memory. Beyond it, the least "
+            "recently used thread is forgotten and can no longer be resumed."
+        },
+    )
+
+    approximate_sample_rate: float = field(
+        default_factory=lambda: _env_float("APPROXIMATE_SAMPLE_RATE", 0.1),
+        metadata={
+            "description": "Fraction of rentals, with their payments, kept in the sample that approximate queries "
+            "and insights are answered from (app.db.approximate)."
+        },
+    )
+
+    approximate_replicates: int = field(
+        default_factory=lambda: _env_int("APPROXIMATE_REPLICATES", 10),
+        metadata={
+            "description": "Random groups the sample is split into; the spread of their answers gives the "
+            "confidence intervals of approximate results."
+        },
+    )
+
+
+settings = Settings()
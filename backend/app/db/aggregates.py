@@ -0,0 +1,218 @@
+"""Persisted, incrementally maintained sales buckets for the sales-overview insight.
+
+Per-bucket totals (sales, profit, expenses, distinct customers) are stored for day, week and
+month granularity in a small SQLite side file next to the database. A refresh only recomputes
+the buckets touched by payments added since the last refresh, so closed periods are computed
+once and reused. Distinct customer counts cannot be rolled up from finer buckets, which is why
+every granularity is stored rather than derived from days. Amounts are stored rounded to cents,
+as the reference query's ``Numeric(..., 2)`` sums are returned.
+
+The store is rebuilt from scratch when rows that were already aggregated change: the sakila
+triggers stamp ``last_update`` on every write, so the row count and the sum of ``last_update``
+timestamps at or below the id watermark are compared with the values recorded at the previous
+refresh, and when the stored layout (``_LAYOUT``) changed.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import closing
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..config import settings
+from .database import DATABASE_PATH, connect, data_version
+
+GRANULARITIES = ("day", "week", "month")
+
+SalesBucket = namedtuple("SalesBucket", "date Sales Profit Expenses Customers")
+
+# SQL expressions giving the label and the start date of the bucket a payment falls in.
+# Weeks run Monday to Sunday and are labelled by their Monday.
+_BUCKET_SQL = {
+    "day": ("date(p.payment_date)", "date(p.payment_date)"),
+    "week": ("date(p.payment_date, 'weekday 0', '-6 days')", "date(p.payment_date, 'weekday 0', '-6 days')"),
+    "month": ("strftime('%Y-%m', p.payment_date)", "date(p.payment_date, 'start of month')"),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sales_bucket (
+    granularity TEXT NOT NULL,
+    start TEXT NOT NULL,
+    label TEXT NOT NULL,
+    sales REAL NOT NULL,
+    profit REAL NOT NULL,
+    expenses REAL NOT NULL,
+    customers INTEGER NOT NULL,
+    PRIMARY KEY (granularity, start)
+);
+CREATE TABLE IF NOT EXISTS aggregate_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+# Version of the stored bucket values; stores written with another one are rebuilt
+_LAYOUT = "2"
+
+# Fact tables feeding the buckets, with their id columns
+FACT_TABLES: Dict[str, str] = {"payment": "payment_id", "rental": "rental_id"}
+
+
+def fact_marks(conn: sqlite3.Connection, table: str, watermark: int) -> Tuple:
+    sql = f"SELECT COUNT(*), TOTAL(julianday(last_update)) FROM {table} WHERE {FACT_TABLES[table]} <= ?"
+    return tuple(conn.execute(sql, (watermark,)).fetchone())
+
+
+def bucket_start(day: date, granularity: str) -> date:
+    """Return the first day of the bucket containing ``day``."""
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(start: date, granularity: str) -> date:
+    """Return the first day after the bucket starting at ``start``."""
+    if granularity == "week":
+        return start + timedelta(days=7)
+    if granularity == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+class SalesBuckets:
+    """Sales totals per day, week and month, persisted in ``path`` and refreshed incrementally.
+
+    Args:
+        path: SQLite file the buckets are stored in.
+        connect: Opens a connection to the source database.
+        version: Returns the source data version; buckets are only checked for staleness when
+            it changes.
+    """
+
+    def __init__(self, path: str, connect: Callable[[], sqlite3.Connection], version: Callable[[], str]):
+        self.path = path
+        self.connect = connect
+        self.version = version
+        self.checked_version: Optional[str] = None
+        self._lock = threading.Lock()
+        self._created = False
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        if not self._created:
+            # Both persist in the file, so once per process is enough
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.executescript(_SCHEMA)
+            self._created = True
+        return conn
+
+    def refresh(self) -> None:
+        """Recompute the buckets affected by changes to the source since the last refresh."""
+        version = self.version()
+        if version == self.checked_version:
+            return
+        with self._lock, closing(self._open()) as store, closing(self.connect()) as source:
+            # Serializes refreshes across processes sharing the file, and makes each one atomic
+            store.execute("BEGIN IMMEDIATE")
+            try:
+                source.execute("BEGIN")
+                state = dict(store.execute("SELECT name, value FROM aggregate_state"))
+                stale = state.get("layout") != _LAYOUT or any(
+                    state.get(f"{table}_marks")
+                    != repr(fact_marks(source, table, int(state.get(f"{table}_watermark", 0))))
+                    for table in FACT_TABLES
+                )
+                if stale:
+                    store.execute("DELETE FROM sales_bucket")
+                    self._recompute(source, store, None)
+                else:
+                    days = source.execute(
+                        "SELECT DISTINCT date(payment_date) FROM payment WHERE payment_id > ?",
+                        (int(state.get("payment_watermark", 0)),),
+                    ).fetchall()
+                    self._recompute(source, store, [date.fromisoformat(day) for (day,) in days if day])
+
+                new_state = {"layout": _LAYOUT}
+                for table, id_column in FACT_TABLES.items():
+                    sql = f"SELECT COALESCE(MAX({id_column}), 0) FROM {table}"
+                    (watermark,) = source.execute(sql).fetchone()
+                    new_state[f"{table}_watermark"] = str(watermark)
+                    new_state[f"{table}_marks"] = repr(fact_marks(source, table, watermark))
+                store.executemany("INSERT OR REPLACE INTO aggregate_state VALUES (?, ?)", new_state.items())
+                store.execute("COMMIT")
+            except BaseException:
+                store.execute("ROLLBACK")
+                raise
+            finally:
+                source.rollback()
+            self.checked_version = version
+
+    def _recompute(self, source: sqlite3.Connection, store: sqlite3.Connection, days: Optional[List[date]]) -> None:
+        """Recompute every bucket overlapping ``days``, or all buckets if ``days`` is None."""
+        if days is not None and not days:
+            return
+        for granularity in GRANULARITIES:
+            where, params = "", ()
+            if days is not None:
+                start = bucket_start(min(days), granularity)
+                end = bucket_end(bucket_start(max(days), granularity), granularity)
+                where = "WHERE p.payment_date >= ? AND p.payment_date < ?"
+                params = (start.isoformat(), end.isoformat())
+                store.execute(
+                    "DELETE FROM sales_bucket WHERE granularity = ? AND start >= ? AND start < ?",
+                    (granularity, *params),
+                )
+            label, start_expr = _BUCKET_SQL[granularity]
+            rows = source.execute(
+                f"""
+                SELECT {start_expr} AS start, {label} AS label, SUM(p.amount), SUM(p.amount * 0.7),
+                       SUM(p.amount * 0.3), COUNT(DISTINCT r.customer_id)
+                FROM payment p JOIN rental r ON p.rental_id = r.rental_id
+                {where}
+                GROUP BY start
+                """,
+                params,
+            ).fetchall()
+            store.executemany(
+                "INSERT OR REPLACE INTO sales_bucket VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (granularity, start, label, round(sales, 2), round(profit, 2), round(expenses, 2), customers)
+                    for start, label, sales, profit, expenses, customers in rows
+                    if start is not None
+                ),
+            )
+
+    def overview(
+        self,
+        granularity: str = "month",
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        limit: Optional[int] = None,
+    ) -> List[SalesBucket]:
+        """Return the buckets overlapping ``[start, end]`` in date order, refreshing first if needed."""
+        self.refresh()
+        where, params = ["granularity = ?"], [granularity]
+        if start is not None:
+            where.append("start >= ?")
+            params.append(bucket_start(start, granularity).isoformat())
+        if end is not None:
+            where.append("start <= ?")
+            params.append(end.isoformat())
+        sql = (
+            "SELECT label, sales, profit, expenses, customers FROM sales_bucket "
+            f"WHERE {' AND '.join(where)} ORDER BY start LIMIT ?"
+        )
+        with closing(self._open()) as store:
+            return [SalesBucket(*row) for row in store.execute(sql, (*params, -1 if limit is None else limit))]
+
+
+sales_buckets = SalesBuckets(
+    settings.aggregates_path or os.path.join(os.path.dirname(DATABASE_PATH), "insight-aggregates.db"),
+    connect,
+    data_version,
+)
@@ -0,0 +1,561 @@
+"""Approximate answers to aggregate queries over the fact tables, with confidence intervals.
+
+Samples. ``SampleStore`` keeps a uniform sample of ``payment`` and ``rental`` in the aggregates
+side file. Rows are picked by a hash of their rental id, so a payment is sampled exactly when its
+rental is and joins between the two stay complete within the sample. Every sampled row also
+belongs to one of ``replicates`` random groups.
+
+Queries. ``SampleStore.query`` runs an aggregate query against the sample: common table
+expressions named ``payment`` and ``rental`` are prepended to it and shadow the real tables, once
+over the whole sample and once per random group. The query runs on a read-only connection with the
+read-only authorizer set, like any other user query. SUM, TOTAL and COUNT columns are scaled up by
+the sampling rate, averages and other ratios are taken as they are, and the spread of the
+per-group answers gives the standard error (the random groups method) from which a 95% confidence
+interval is formed with Student's t. Queries a sample cannot answer without bias are refused with
+a reason, so callers can run them exactly: those without an aggregate in the outermost select,
+with COUNT(DISTINCT), MIN, MAX, HAVING or window functions, and compound selects. So are answers
+with groups found in too few random groups: a group that rare in the sample is poorly estimated,
+and others like it may be missing from the sample altogether.
+
+Sketches. Distinct counts come from HyperLogLog sketches of the customer and inventory ids of
+rentals, kept per month and per store. Sketches merge, so any set of months or stores is counted
+without a scan.
+
+The store is maintained like the sales buckets in ``app.db.aggregates``: rows added to the fact
+tables are sampled and sketched on refresh, and everything is rebuilt when rows already seen
+change.
+"""
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+from contextlib import closing
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..config import settings
+from .aggregates import FACT_TABLES, fact_marks
+from .database import DATABASE_PATH, _read_only_authorizer, connect, data_version
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CONFIDENCE = 0.95
+
+# Two-sided 95% quantiles of Student's t for 1 to 30 degrees of freedom; the normal one beyond
+# fmt: off
+_T95 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+# fmt: on
+_Z95 = 1.96
+
+# Sampling key of each fact table: payments follow their rental. Knuth's multiplicative hash of
+# the key decides whether a row is sampled, a second multiplier its random group.
+_SAMPLE_KEYS = {"payment": "COALESCE(rental_id, payment_id)", "rental": "rental_id"}
+_SAMPLE_HASH = "(({key}) * 2654435761) % 4294967296"
+_GROUP_HASH = "((({key}) * 2246822519) % 4294967296) % {replicates}"
+
+# Columns the samples are indexed on, for joins and the per-group views
+_SAMPLE_INDEXES = {
+    "payment": ("rental_id", "customer_id", "replicate"),
+    "rental": ("rental_id", "inventory_id", "customer_id", "replicate"),
+}
+
+# Distinct-count sketches by (column, stratum kind): SQL yielding (stratum, value) for the
+# rentals after a rental id watermark
+_SKETCHES: Dict[Tuple[str, str], str] = {
+    ("rental.customer_id", "month"): (
+        "SELECT strftime('%Y-%m', rental_date), customer_id FROM rental WHERE rental_id > ?"
+    ),
+    ("rental.inventory_id", "month"): (
+        "SELECT strftime('%Y-%m', rental_date), inventory_id FROM rental WHERE rental_id > ?"
+    ),
+    ("rental.customer_id", "store"): (
+        "SELECT i.store_id, r.customer_id FROM rental r JOIN inventory i ON r.inventory_id = i.inventory_id "
+        "WHERE r.rental_id > ?"
+    ),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sketch (
+    name TEXT NOT NULL,
+    stratum TEXT NOT NULL,
+    registers BLOB NOT NULL,
+    PRIMARY KEY (name, stratum)
+);
+CREATE TABLE IF NOT EXISTS sample_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def _t95(df: int) -> float:
+    return _T95[df - 1] if df <= len(_T95) else _Z95
+
+
+@dataclass(frozen=True)
+class Estimate:
+    """An estimated value with the bounds of its 95% confidence interval."""
+
+    value: float
+    low: float
+    high: float
+
+
+class HyperLogLog:
+    """HyperLogLog sketch of a set of values, with ``2 ** precision`` one-byte registers.
+
+    The relative standard error of the count is ``1.04 / sqrt(2 ** precision)``, 0.8% at the
+    default precision of 14 (16 KiB per sketch). numpy is imported on first use, keeping it out of
+    the application's startup.
+    """
+
+    def __init__(self, precision: int = 14, registers: Optional["np.ndarray"] = None):
+        import numpy as np
+
+        self.precision = precision
+        self.registers = np.zeros(1 << precision, dtype=np.uint8) if registers is None else registers
+
+    @staticmethod
+    def _hash(values: Iterable[Any]) -> "np.ndarray":
+        import numpy as np
+
+        values = list(values)
+        try:
+            x = np.asarray(values, dtype=np.int64).view(np.uint64)
+        except (TypeError, ValueError, OverflowError):
+            x = np.asarray(
+                [int.from_bytes(hashlib.blake2b(repr(v).encode(), digest_size=8).digest(), "little") for v in values],
+                dtype=np.uint64,
+            )
+        # SplitMix64 finalizer: spreads consecutive ids over all 64 bits
+        x = x + np.uint64(0x9E3779B97F4A7C15)
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+    def add(self, values: Iterable[Any]) -> "HyperLogLog":
+        import numpy as np
+
+        hashes = self._hash(values)
+        if not len(hashes):
+            return self
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.intp)
+        rest = hashes << np.uint64(p)
+        # Rank: position of the first set bit after the index bits (frexp gives the bit length)
+        bit_length = np.frexp(rest.astype(np.float64))[1]
+        rank = np.clip(65 - bit_length, 1, 64 - p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        import numpy as np
+
+        return HyperLogLog(self.precision, np.maximum(self.registers, other.registers))
+
+    def count(self) -> float:
+        import numpy as np
+
+        m = len(self.registers)
+        raw = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        # Linear counting is more accurate for small sets
+        if raw <= 2.5 * m and zeros:
+            return m * math.log(m / zeros)
+        return float(raw)
+
+    def estimate(self) -> Estimate:
+        value = self.count()
+        half = _Z95 * 1.04 / math.sqrt(len(self.registers)) * value
+        return Estimate(round(value), max(0, math.floor(value - half)), math.ceil(value + half))
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        import numpy as np
+
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(int(math.log2(len(registers))), registers)
+
+
+@dataclass
+class ApproximateResult:
+    """Answer to a query from the samples, or the reason they cannot answer it.
+
+    ``rows`` hold point estimates in the query's column order; ``intervals`` hold, for every row,
+    the ``(low, high)`` confidence bounds of each estimated column.
+    """
+
+    columns: List[str] = field(default_factory=list)
+    rows: List[Tuple] = field(default_factory=list)
+    intervals: List[Dict[str, Tuple[float, float]]] = field(default_factory=list)
+    sample_rate: float = 0.0
+    reason: Optional[str] = None
+
+    @property
+    def approximate(self) -> bool:
+        return self.reason is None
+
+    def add_column(self, name: str, estimates: List[Estimate]) -> None:
+        """Append a column estimated elsewhere (from sketches, for example)."""
+        self.columns.append(name)
+        self.rows = [(*row, estimate.value) for row, estimate in zip(self.rows, estimates)]
+        for interval, estimate in zip(self.intervals, estimates):
+            interval[name] = (estimate.low, estimate.high)
+
+    def records(self, digits: int = 4) -> List[Dict[str, Any]]:
+        """Rows as dicts, with the interval of each estimated column under ``<column>_ci`` and
+        estimates rounded to ``digits`` decimals."""
+
+        def rounded(value: Any) -> Any:
+            return round(value, digits) if isinstance(value, float) else value
+
+        records = []
+        for row, interval in zip(self.rows, self.intervals):
+            record = {name: rounded(value) for name, value in zip(self.columns, row)}
+            record.update({f"{name}_ci": [rounded(low), rounded(high)] for name, (low, high) in interval.items()})
+            records.append(record)
+        return records
+
+
+# Aggregates a sample estimates: sums and counts scale with it, anything else does not
+_AGGREGATE = re.compile(r"\b(sum|total|count|avg|min|max|group_concat)\s*\(", re.IGNORECASE)
+_ADDITIVE = {"sum", "total", "count"}
+
+
+def _mask(sql: str) -> Tuple[str, str]:
+    """Return two same-length copies of ``sql``: one with string literals, quoted identifiers and
+    comments blanked, and one with everything inside parentheses blanked as well."""
+    plain, flat = list(sql), list(sql)
+    depth, i, n = 0, 0, len(sql)
+    while i < n:
+        c = sql[i]
+        if c in "'\"`[":
+            end = sql.find("]" if c == "[" else c, i + 1)
+            while end != -1 and c in "'\"" and sql[end + 1 : end + 2] == c:
+                end = sql.find(c, end + 2)
+            end = n - 1 if end == -1 else end
+        elif sql.startswith("--", i):
+            end = sql.find("\n", i)
+            end = n - 1 if end == -1 else end
+        elif sql.startswith("/*", i):
+            end = sql.find("*/", i + 2)
+            end = n - 1 if end == -1 else end + 1
+        else:
+            if c == "(":
+                depth += 1
+            if depth:
+                flat[i] = " "
+            if c == ")":
+                depth = max(depth - 1, 0)
+            i += 1
+            continue
+        for j in range(i, end + 1):
+            plain[j] = flat[j] = " "
+        i = end + 1
+    return "".join(plain), "".join(flat)
+
+
+def analyze(sql: str) -> Tuple[Optional[List[str]], Optional[str], str]:
+    """Classify the outermost select list of ``sql`` for estimation from samples.
+
+    Returns the kind of every output column ("key" for group keys, "sum" for SUM/TOTAL/COUNT
+    expressions, "ratio" for other aggregates), the reason the query cannot be estimated (None if
+    it can), and the query without its outermost LIMIT, run on the random groups so that every
+    group of the full answer is found in them.
+    """
+    sql = sql.strip().rstrip(";")
+    plain, flat = _mask(sql)
+    lowered, flat_lowered = plain.lower(), flat.lower()
+    if not re.search(r"\b(payment|rental)\b", lowered):
+        return None, "it does not read payment or rental", sql
+    if re.search(r"\b(union|intersect|except)\b", flat_lowered):
+        return None, "compound selects are not estimated", sql
+    if re.search(r"\bhaving\b", flat_lowered):
+        return None, "HAVING thresholds do not scale with a sample", sql
+    select = re.search(r"\bselect\b", flat_lowered)
+    start = select.end() if select else 0
+    source = re.search(r"\bfrom\b", flat_lowered[start:])
+    if select is None or source is None:
+        return None, "there is no SELECT ... FROM to estimate", sql
+    if re.match(r"\s*(distinct|all)\b", flat_lowered[start:]):
+        return None, "SELECT DISTINCT is not estimated", sql
+
+    end = start + source.start()
+    bounds = [start, *(start + m.start() + 1 for m in re.finditer(",", flat[start:end])), end + 1]
+    kinds = []
+    for left, right in zip(bounds, bounds[1:]):
+        item = lowered[left : right - 1].strip()
+        functions = {name.lower() for name in _AGGREGATE.findall(item)}
+        if item == "*" or item.endswith(".*"):
+            return None, "SELECT * is not estimated", sql
+        if re.search(r"\bover\b", item):
+            return None, "window functions are not estimated", sql
+        if re.search(r"\bcount\s*\(\s*distinct\b", item):
+            return None, "COUNT(DISTINCT) cannot be scaled up from a sample", sql
+        if functions & {"min", "max", "group_concat"}:
+            return None, "MIN, MAX and GROUP_CONCAT cannot be estimated from a sample", sql
+        kinds.append("key" if not functions else "sum" if functions <= _ADDITIVE else "ratio")
+    if all(kind == "key" for kind in kinds):
+        return None, "the outermost select has no aggregate", sql
+
+    limits = list(re.finditer(r"\blimit\b", flat_lowered))
+    return kinds, None, sql[: limits[-1].start()] if limits else sql
+
+
+class SampleStore:
+    """Samples of the fact tables and distinct-count sketches, persisted in ``path``.
+
+    Args:
+        path: SQLite file the samples and sketches are stored in.
+        connect: Opens a connection to the source database; it must accept URI filenames in
+            ATTACH, as the connections of ``app.db.database`` do.
+        version: Returns the source data version; the store is only checked for staleness when
+            it changes.
+        rate: Fraction of rentals (and their payments) sampled.
+        replicates: Random groups the sample is split into to estimate standard errors.
+        min_coverage: Share of the random groups every group of an answer must be found in; an
+            answer with sparser groups is refused, to be computed exactly.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        connect: Callable[[], sqlite3.Connection],
+        version: Callable[[], str],
+        rate: float = 0.1,
+        replicates: int = 10,
+        min_coverage: float = 0.5,
+    ):
+        self.path = path
+        self.connect = connect
+        self.version = version
+        self.rate = rate
+        self.replicates = replicates
+        self.min_coverage = min_coverage
+        self.checked_version: Optional[str] = None
+        self._columns: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.executescript(_SCHEMA)
+        return conn
+
+    def refresh(self) -> None:
+        """Sample and sketch the fact rows added since the last refresh, or rebuild if rows changed."""
+        version = self.version()
+        if version == self.checked_version:
+            return
+        with self._lock, closing(self._open()) as store, closing(self.connect()) as source:
+            store.execute("BEGIN IMMEDIATE")
+            try:
+                source.execute("BEGIN")
+                state = dict(store.execute("SELECT name, value FROM sample_state"))
+                settings_changed = state.get("design") != f"{self.rate}/{self.replicates}"
+                stale = settings_changed or any(
+                    state.get(f"{table}_marks")
+                    != repr(fact_marks(source, table, int(state.get(f"{table}_watermark", 0))))
+                    for table in FACT_TABLES
+                )
+                if stale:
+                    self._create(source, store)
+                    state = {}
+                for table in FACT_TABLES:
+                    self._sample(source, store, table, int(state.get(f"{table}_watermark", 0)))
+                self._sketch(source, store, int(state.get("rental_watermark", 0)))
+
+                new_state = {"design": f"{self.rate}/{self.replicates}"}
+                for table, id_column in FACT_TABLES.items():
+                    (watermark,) = source.execute(f"SELECT COALESCE(MAX({id_column}), 0) FROM {table}").fetchone()
+                    new_state[f"{table}_watermark"] = str(watermark)
+                    new_state[f"{table}_marks"] = repr(fact_marks(source, table, watermark))
+                store.executemany("INSERT OR REPLACE INTO sample_state VALUES (?, ?)", new_state.items())
+                store.execute("COMMIT")
+            except BaseException:
+                store.execute("ROLLBACK")
+                raise
+            finally:
+                source.rollback()
+            self._columns = {
+                table: [row[1] for row in store.execute(f"PRAGMA table_info(sample_{table})")][:-1]
+                for table in FACT_TABLES
+            }
+            self.checked_version = version
+
+    def _create(self, source: sqlite3.Connection, store: sqlite3.Connection) -> None:
+        """(Re)create empty sample tables shaped like the fact tables, and drop all sketches."""
+        store.execute("DELETE FROM sketch")
+        for table in FACT_TABLES:
+            declared = source.execute(f"PRAGMA table_info({table})").fetchall()
+            columns = ", ".join(f'"{name}" {kind}' for _, name, kind, *_ in declared)
+            store.execute(f"DROP TABLE IF EXISTS sample_{table}")
+            store.execute(f"CREATE TABLE sample_{table} ({columns}, replicate INTEGER NOT NULL)")
+            for column in _SAMPLE_INDEXES[table]:
+                store.execute(f"CREATE INDEX sample_{table}_{column} ON sample_{table} ({column})")
+
+    def _sample(self, source: sqlite3.Connection, store: sqlite3.Connection, table: str, watermark: int) -> None:
+        key = _SAMPLE_KEYS[table]
+        rows = source.execute(
+            f"SELECT *, {_GROUP_HASH.format(key=key, replicates=self.replicates)} FROM {table} "
+            f"WHERE {FACT_TABLES[table]} > ? AND {_SAMPLE_HASH.format(key=key)} < ?",
+            (watermark, int(self.rate * 2**32)),
+        )
+        width = len(rows.description)
+        store.executemany(f"INSERT INTO sample_{table} VALUES ({', '.join('?' * width)})", rows)
+
+    def _sketch(self, source: sqlite3.Connection, store: sqlite3.Connection, watermark: int) -> None:
+        for (column, by), sql in _SKETCHES.items():
+            name = f"{column}/{by}"
+            rows = source.execute(sql, (watermark,)).fetchall()
+            values: Dict[str, list] = {}
+            for stratum, value in rows:
+                if stratum is not None and value is not None:
+                    values.setdefault(str(stratum), []).append(value)
+            for stratum, added in values.items():
+                found = store.execute(
+                    "SELECT registers FROM sketch WHERE name = ? AND stratum = ?", (name, stratum)
+                ).fetchone()
+                sketch = HyperLogLog.from_bytes(found[0]) if found else HyperLogLog()
+                store.execute(
+                    "INSERT OR REPLACE INTO sketch VALUES (?, ?, ?)", (name, stratum, sketch.add(added).to_bytes())
+                )
+
+    def distinct(self, column: str, by: str, strata: Optional[Iterable[Any]] = None) -> Estimate:
+        """Estimate the number of distinct values of ``column`` over the ``by`` strata listed in
+        ``strata`` (months as ``YYYY-MM``, or store ids), or over all of them."""
+        if (column, by) not in _SKETCHES:
+            raise KeyError(f"No {column} sketch by {by}; available: {sorted(_SKETCHES)}")
+        self.refresh()
+        sql, params = "SELECT registers FROM sketch WHERE name = ?", [f"{column}/{by}"]
+        if strata is not None:
+            strata = [str(stratum) for stratum in strata]
+            sql += f" AND stratum IN ({', '.join('?' * len(strata))})"
+            params.extend(strata)
+        merged = HyperLogLog()
+        with closing(self._open()) as store:
+            for (registers,) in store.execute(sql, params):
+                merged = merged.merge(HyperLogLog.from_bytes(registers))
+        return merged.estimate()
+
+    def query(self, sql: str) -> ApproximateResult:
+        """Estimate the answer to the aggregate query ``sql`` from the samples."""
+        kinds, reason, group_sql = analyze(sql)
+        if reason is not None:
+            return ApproximateResult(reason=reason)
+        self.refresh()
+        with closing(self.connect()) as conn:
+            conn.execute("ATTACH DATABASE ? AS samples", (f"file:{self.path}?mode=ro",))
+            conn.set_authorizer(_read_only_authorizer)
+            columns, rows = self._run(conn, sql, None)
+            groups = [self._run(conn, group_sql, replicate)[1] for replicate in range(self.replicates)]
+        if len(columns) != len(kinds):
+            return ApproximateResult(reason="the select list could not be matched to the result columns")
+        return self._estimate(columns, kinds, rows, groups)
+
+    def _run(self, conn: sqlite3.Connection, sql: str, replicate: Optional[int]) -> Tuple[List[str], List[Tuple]]:
+        """Run ``sql`` with the fact tables shadowed by the sample, or one random group of it."""
+        where = "" if replicate is None else f" WHERE replicate = {int(replicate)}"
+        shadows = []
+        for table, columns in self._columns.items():
+            selected = ", ".join(f'"{name}"' for name in columns)
+            shadows.append(f"{table} AS (SELECT {selected} FROM samples.sample_{table}{where})")
+        sql = sql.strip().rstrip(";")
+        # The query's own common table expressions follow the sample ones and may read them
+        leading = re.match(r"\s*with(\s+recursive)?\b", _mask(sql)[0], re.IGNORECASE)
+        if leading:
+            sql = f"{sql[: leading.end()]} {', '.join(shadows)}, {sql[leading.end() :]}"
+        else:
+            sql = f"WITH {', '.join(shadows)} {sql}"
+        cursor = conn.execute(sql)
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+    def _estimate(
+        self, columns: List[str], kinds: List[str], rows: List[Tuple], groups: List[List[Tuple]]
+    ) -> ApproximateResult:
+        keys = [i for i, kind in enumerate(kinds) if kind == "key"]
+        by_key = [{tuple(row[i] for i in keys): row for row in group} for group in groups]
+        matched = [[found.get(tuple(row[i] for i in keys)) for found in by_key] for row in rows]
+        sparse = sum(
+            1 for replicas in matched if sum(r is not None for r in replicas) < self.min_coverage * self.replicates
+        )
+        if sparse:
+            return ApproximateResult(
+                reason=f"{sparse} of {len(rows)} groups are found in too few random groups of the sample"
+            )
+
+        def value(row: Optional[Tuple], i: int) -> Optional[float]:
+            v = None if row is None else row[i]
+            return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else None
+
+        # SUM/COUNT expressions scale with the sample only if they add up over the random groups
+        # (SUM(x) / COUNT(*) does not, for example)
+        additive = {}
+        for i, kind in enumerate(kinds):
+            if kind == "sum":
+                additive[i] = all(
+                    math.isclose(
+                        sum(value(r, i) or 0.0 for r in replicas),
+                        value(row, i) or 0.0,
+                        rel_tol=1e-3,
+                        abs_tol=0.01 * self.replicates,
+                    )
+                    for row, replicas in zip(rows, matched)
+                )
+
+        # Scaled-up counts and sums of integers are whole numbers: their estimates are rounded and
+        # their intervals widened outwards to whole numbers
+        integral = {
+            i for i in additive if additive[i] and all(isinstance(row[i], int) for row in rows if row[i] is not None)
+        }
+
+        estimates, intervals = [], []
+        for row, replicas in zip(rows, matched):
+            estimate, interval = list(row), {}
+            for i, kind in enumerate(kinds):
+                v = value(row, i)
+                if kind == "key" or v is None:
+                    continue
+                if additive.get(i):
+                    point = v / self.rate
+                    replicated = [(value(r, i) or 0.0) * self.replicates / self.rate for r in replicas]
+                else:
+                    point = v
+                    replicated = [x for x in (value(r, i) for r in replicas) if x is not None]
+                if i in integral:
+                    point = round(point)
+                estimate[i] = point
+                n = len(replicated)
+                if n >= 2:
+                    mean = sum(replicated) / n
+                    error = math.sqrt(sum((x - mean) ** 2 for x in replicated) / (n * (n - 1)))
+                    half = _t95(n - 1) * error
+                    # Sums and counts of non-negative values cannot be negative
+                    low = max(point - half, 0.0) if point >= 0 and min(replicated) >= 0 else point - half
+                    high = point + half
+                    if i in integral:
+                        low, high = math.floor(low), math.ceil(high)
+                    interval[columns[i]] = (low, high)
+            estimates.append(tuple(estimate))
+            intervals.append(interval)
+        return ApproximateResult(columns, estimates, intervals, self.rate)
+
+
+sample_store = SampleStore(
+    settings.aggregates_path or os.path.join(os.path.dirname(DATABASE_PATH), "insight-aggregates.db"),
+    connect,
+    data_version,
+    rate=settings.approximate_sample_rate,
+    replicates=settings.approximate_replicates,
+)
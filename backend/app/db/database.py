@@ -1,8 +1,13 @@
 import os
+import sqlite3
 
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+from ..config import settings
+from .snapshot import SnapshotStore
 
 # Get the absolute path to the data directory
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -14,10 +19,76 @@ os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
 SQLALCHEMY_DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+# Authorizer actions a read-only connection may perform
+_READ_ONLY_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    getattr(sqlite3, "SQLITE_RECURSIVE", 33),
+}
+
+
+def _read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    return sqlite3.SQLITE_OK if action in _READ_ONLY_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def connect() -> sqlite3.Connection:
+    """Open a raw, read-only sqlite3 connection to the file, or to the in-memory snapshot when enabled."""
+    if snapshot is not None:
+        return snapshot.connect()
+    conn = sqlite3.connect(f"file:{DATABASE_PATH}?mode=ro", uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def connect_readonly() -> sqlite3.Connection:
+    """Open a raw sqlite3 connection that can only run SELECT statements.
+
+    On top of ``connect``, an authorizer rejects anything other than reads, so user supplied SQL
+    cannot modify the database or change connection state.
+    """
+    conn = connect()
+    conn.set_authorizer(_read_only_authorizer)
+    return conn
+
+
+def file_data_version() -> str:
+    """Return a token that changes whenever the database file or its WAL is written."""
+    parts = []
+    for path in (DATABASE_PATH, f"{DATABASE_PATH}-wal"):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        parts.append(f"{stat.st_mtime_ns:x}.{stat.st_size:x}")
+    return "-".join(parts) or "0"
+
+
+def data_version() -> str:
+    """Return the version of the data reads are currently served from."""
+    if snapshot is not None and snapshot.version is not None:
+        return snapshot.version
+    return file_data_version()
+
+
+def data_last_modified() -> float:
+    """Return the time the served data was last written, as a POSIX timestamp."""
+    if snapshot is not None and snapshot.source_modified is not None:
+        return snapshot.source_modified
+    mtimes = [os.path.getmtime(path) for path in (DATABASE_PATH, f"{DATABASE_PATH}-wal") if os.path.exists(path)]
+    return max(mtimes, default=0.0)
+
+
+# In snapshot mode reads are served from a shared in-memory copy of the database. `engine`
+# always points at the file so schema management and writes keep working.
+snapshot = SnapshotStore(DATABASE_PATH, file_data_version) if settings.snapshot_mode else None
+read_engine = create_engine("sqlite://", creator=snapshot.connect, poolclass=NullPool) if snapshot else engine
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -0,0 +1,91 @@
+"""Shared in-memory snapshot of the SQLite database for low-latency analytic reads.
+
+The database file is copied with the sqlite3 backup API into a named, shared-cache in-memory
+database. Readers open cheap connections to that name. A refresh builds a complete copy under
+a new name and then swaps the name readers connect to, so a reader never sees a partially
+loaded snapshot and in-flight queries keep reading the generation they started on.
+"""
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from itertools import count
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore:
+    """Holds the current in-memory copy of ``source_path``.
+
+    Args:
+        source_path: The database file to copy.
+        source_version: Returns a token that changes whenever the file is written. A refresh
+            is skipped when the token matches the one the current snapshot was loaded at.
+    """
+
+    def __init__(self, source_path: str, source_version: Callable[[], str]):
+        self.source_path = source_path
+        self.source_version = source_version
+        self.version: Optional[str] = None
+        self.source_modified: Optional[float] = None
+        self._generations = count(1)
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._uri: Optional[str] = None
+        # Connections that keep the current and previous generation alive. The previous one is
+        # kept for a full refresh interval so readers that just read its name can still attach.
+        self._anchors: list = []
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reload the snapshot if the source changed. Returns True if a new snapshot was loaded."""
+        with self._refresh_lock:
+            # Read the version before copying: writes racing with the backup trigger another refresh
+            version = self.source_version()
+            if not force and version == self.version:
+                return False
+
+            started = time.perf_counter()
+            uri = f"file:insight-snapshot-{os.getpid()}-{next(self._generations)}?mode=memory&cache=shared"
+            anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+            try:
+                source.backup(anchor)
+            except Exception:
+                anchor.close()
+                raise
+            finally:
+                source.close()
+
+            with self._lock:
+                self._uri = uri
+                self.version = version
+                self.source_modified = os.path.getmtime(self.source_path)
+                self._anchors.append(anchor)
+                stale, self._anchors = self._anchors[:-2], self._anchors[-2:]
+            for conn in stale:
+                conn.close()
+            logger.info("Loaded database snapshot %s in %.0f ms", uri, (time.perf_counter() - started) * 1000)
+            return True
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a read-only connection to the current snapshot, loading it on first use."""
+        if self._uri is None:
+            self.refresh()
+        with self._lock:
+            uri = self._uri
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    async def refresh_periodically(self, interval: float) -> None:
+        """Check the source for changes every ``interval`` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception:
+                logger.exception("Database snapshot refresh failed; still serving %s", self.version)
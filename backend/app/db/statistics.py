@@ -0,0 +1,190 @@
+"""Table statistics for the agent: row counts, distinct-value estimates, date ranges and indexes.
+
+Statistics are computed once per data version and stored in the result cache. Tables of up to
+``exact_rows`` rows get exact distinct counts. In larger ones, the leading column of an index is
+estimated from ``sqlite_stat1`` and other columns from a sample of rows. Date columns get their
+range.
+
+``analyze`` gathers ``sqlite_stat1``, which the query planner uses as well. It is a write to the
+database file, so the application only runs it at startup when the statistics are missing or stale,
+and one process at a time. ``python -m app.db.statistics`` runs it unconditionally, as a
+maintenance command.
+"""
+
+import json
+import logging
+import sqlite3
+from contextlib import closing
+from typing import Any, Callable, Dict, List, Optional
+
+from ..utils.cache import cache
+from .database import DATABASE_PATH, connect, data_version
+
+logger = logging.getLogger(__name__)
+
+# Declared column types treated as dates
+_DATE_TYPES = ("DATE", "TIME")
+
+# Share by which a table's row count may drift from the one recorded in sqlite_stat1 before the
+# statistics are considered stale
+STALE_DRIFT = 0.2
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _needs_analyze(conn: sqlite3.Connection) -> bool:
+    """Whether ``sqlite_stat1`` is missing, or a table's row count drifted by more than
+    ``STALE_DRIFT`` since it was analyzed."""
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone():
+        return True
+    recorded: Dict[str, int] = {}
+    for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1 WHERE idx IS NOT NULL"):
+        recorded[table] = max(recorded.get(table, 0), int(stat.split()[0]))
+    for table, analyzed_rows in recorded.items():
+        (rows,) = conn.execute(f"SELECT COUNT(*) FROM {_quote(table)}").fetchone()
+        if abs(rows - analyzed_rows) > STALE_DRIFT * max(analyzed_rows, 1):
+            return True
+    return False
+
+
+def analyze(path: str = DATABASE_PATH, force: bool = False) -> bool:
+    """Gather ``sqlite_stat1`` for the database file at ``path`` if it is missing or stale, or
+    always with ``force``. Returns whether it ran.
+
+    The write lock is taken without waiting, so when several workers start at once one of them
+    analyzes and the others skip. Failures, e.g. on a read-only file, are logged: distinct counts
+    of large tables are then all estimated from samples.
+    """
+    try:
+        with closing(sqlite3.connect(path, timeout=0, isolation_level=None)) as conn:
+            if not force and not _needs_analyze(conn):
+                return False
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                logger.info("%s is being written by another process; not analyzing it now", path)
+                return False
+            try:
+                # Checked again under the lock, in case another worker just analyzed
+                ran = force or _needs_analyze(conn)
+                if ran:
+                    conn.execute("ANALYZE")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return ran
+    except sqlite3.Error:
+        logger.exception("Could not analyze %s; index statistics may be missing or stale", path)
+        return False
+
+
+class TableStatistics:
+    """Statistics of every table in the database behind ``connect``.
+
+    Args:
+        connect: Opens a connection to the database.
+        version: Returns the data version; statistics are recomputed when it changes.
+        sample_rows: Rows read to estimate distinct counts of columns not leading an index.
+        exact_rows: Tables of up to this many rows get exact distinct counts of every column.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], sqlite3.Connection],
+        version: Callable[[], str],
+        sample_rows: int = 10_000,
+        exact_rows: int = 200_000,
+    ):
+        self.connect = connect
+        self.version = version
+        self.sample_rows = sample_rows
+        self.exact_rows = exact_rows
+
+    def get(self, tables: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Statistics per table, optionally restricted to ``tables``."""
+        encoded = cache.get_or_set(f"table-stats:{self.version()}", lambda: json.dumps(self.compute()).encode())
+        stats = json.loads(encoded)
+        if tables is None:
+            return stats
+        return {table: stats[table] for table in tables if table in stats}
+
+    def compute(self) -> Dict[str, Dict[str, Any]]:
+        with closing(self.connect()) as conn:
+            stat1 = {}
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'").fetchone():
+                stat1 = {
+                    (table, index): [int(n) for n in stat.split() if n.isdigit()]
+                    for table, index, stat in conn.execute(
+                        "SELECT tbl, idx, stat FROM sqlite_stat1 WHERE idx IS NOT NULL"
+                    )
+                }
+            names = [
+                name
+                for (name,) in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+                )
+            ]
+            return {name: self._table(conn, name, stat1) for name in names}
+
+    def _table(self, conn: sqlite3.Connection, table: str, stat1: Dict) -> Dict[str, Any]:
+        quoted = _quote(table)
+        (rows,) = conn.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()
+        columns = [
+            (name, (declared or "").upper(), pk)
+            for _, name, declared, _, _, pk in conn.execute(f"PRAGMA table_info({quoted})")
+        ]
+        profile: Dict[str, Dict[str, Any]] = {name: {} for name, _, _ in columns}
+        exact = rows <= self.exact_rows
+
+        # Indexed columns of large tables: distinct estimate of the leading column from sqlite_stat1
+        # (rows / rows per key, which sqlite_stat1 rounds)
+        indexes = []
+        for _, index, unique, _, _ in conn.execute(f"PRAGMA index_list({quoted})"):
+            index_columns = [name for _, _, name in conn.execute(f"PRAGMA index_info({_quote(index)})")]
+            indexes.append({"name": index, "columns": index_columns, "unique": bool(unique)})
+            stat = stat1.get((table, index))
+            if not index_columns or index_columns[0] is None:
+                # Expression index: its leading key is not a column
+                continue
+            if unique and len(index_columns) == 1:
+                profile[index_columns[0]]["distinct"] = rows
+            elif stat and len(stat) > 1 and stat[1] and not exact:
+                profile[index_columns[0]].setdefault("distinct", round(rows / stat[1]))
+        # A single-column primary key is unique even without an index (INTEGER PRIMARY KEY)
+        if sum(1 for _, _, pk in columns if pk) == 1:
+            profile[next(name for name, _, pk in columns if pk)]["distinct"] = rows
+
+        # Remaining columns: distinct values in the whole of a small table, or in a sample of a large
+        # one, taken as unique if nearly every sampled value is
+        remaining = [name for name, _, _ in columns if "distinct" not in profile[name]]
+        if remaining and rows:
+            selects = ", ".join(f"COUNT(DISTINCT {_quote(name)})" for name in remaining)
+            sample, params = ("", ()) if exact else (" LIMIT ?", (self.sample_rows,))
+            counts = conn.execute(
+                f"SELECT COUNT(*), {selects} FROM (SELECT * FROM {quoted}{sample})", params
+            ).fetchone()
+            sampled = counts[0]
+            for name, distinct in zip(remaining, counts[1:]):
+                profile[name]["distinct"] = rows if sampled < rows and distinct > 0.9 * sampled else distinct
+
+        for name, declared, _ in columns:
+            if any(kind in declared for kind in _DATE_TYPES):
+                profile[name]["min"], profile[name]["max"] = conn.execute(
+                    f"SELECT MIN({_quote(name)}), MAX({_quote(name)}) FROM {quoted}"
+                ).fetchone()
+
+        return {"rows": rows, "columns": profile, "indexes": indexes}
+
+
+table_statistics = TableStatistics(connect, data_version)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    analyze(force=True)
+    logger.info("Analyzed %s", DATABASE_PATH)
@@ -1,18 +1,71 @@
+import asyncio
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
 import uvicorn
 from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .agent.graph import graph
-from .api import insights
-from .db.database import Base, engine
+from .api import admin, insights, query
+from .api.admission import AdmissionMiddleware, admission
+from .config import settings
+from .db import statistics
+from .db.database import Base, engine, snapshot
+
+
+@lru_cache(maxsize=1)
+def get_agents():
+    """Build the CopilotKit agents. The LangGraph graph is imported and compiled on first use."""
+    from .agent.checkpoint import BoundedMemorySaver
+    from .agent.graph import graph
+
+    # The remote endpoint reads and resumes threads by id, so it needs a checkpointer and a config mapping
+    checkpointer = BoundedMemorySaver(max_threads=settings.agent_max_threads)
+    graph = graph.copy(update={"checkpointer": checkpointer, "config": graph.config or {}})
+    return [
+        LangGraphAgent(
+            name="insight_copilot_agent",
+            description="A copilot agent that can extract insights from the Sakila database",
+            graph=graph,
+        )
+    ]
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables
+    await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+    # Index statistics for the planner, before the snapshot copies the file; only gathered when
+    # missing or stale, by one worker at a time
+    await asyncio.to_thread(statistics.analyze)
+    refresher = None
+    if snapshot is not None:
+        await asyncio.to_thread(snapshot.refresh)
+        refresher = asyncio.create_task(snapshot.refresh_periodically(settings.snapshot_refresh_interval))
+    await asyncio.to_thread(insights.sales_buckets.refresh)
+    if insights.columnar_engine is not None:
+        await asyncio.to_thread(insights.columnar_engine.refresh)
+    # Compile the agent graph in the background so the first chat request does not pay for it
+    warmup = asyncio.create_task(asyncio.to_thread(get_agents))
+    yield
+    if refresher is not None:
+        refresher.cancel()
+    await warmup
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
 
 app = FastAPI(
-    title="InsightCopilot API", description="API for extracting insights from the Sakila database", version="1.0.0"
+    title="InsightCopilot API",
+    description="API for extracting insights from the Sakila database",
+    version="1.0.0",
+    lifespan=lifespan,
+)
+
+# Bound concurrent agent runs; excess runs queue briefly, then get 429/503 with Retry-After.
+# Added before CORS so rejections still carry CORS headers.
+app.add_middleware(
+    AdmissionMiddleware, controller=admission, path="/copilotkit", client_header=settings.agent_client_id_header
 )
 
 # Configure CORS
@@ -25,21 +78,15 @@ app.add_middleware(
 )
 
 # Initialize CopilotKit SDK
-sdk = CopilotKitRemoteEndpoint(
-    agents=[
-        LangGraphAgent(
-            name="insight_copilot_agent",
-            description="A copilot agent that can extract insights from the Sakila database",
-            graph=graph,
-        )
-    ],
-)
+sdk = CopilotKitRemoteEndpoint(agents=lambda context: get_agents())
 
 # Add CopilotKit endpoint
 add_fastapi_endpoint(app, sdk, "/copilotkit", use_thread_pool=False)
 
 # Include routers
 app.include_router(insights.router, prefix="/api/v1", tags=["insights"])
+app.include_router(query.router, prefix="/api/v1", tags=["query"])
+app.include_router(admin.router, prefix="/api/v1", tags=["admin"])
 
 
 @app.get("/")
@@ -49,16 +96,14 @@ async def root():
         "version": "1.0.0",
         "docs_url": "/docs",
         "endpoints": {
-            "insights": {
-                "top_films": "/api/v1/insights/top-films",
-                "category_performance": "/api/v1/insights/category-performance",
-                "customer_activity": "/api/v1/insights/customer-activity",
-                "store_performance": "/api/v1/insights/store-performance",
-                "actor_popularity": "/api/v1/insights/actor-popularity",
-            }
+            "insights": {insight.name: f"/api/v1{insight.path}" for insight in insights.registry},
+            "query": "/api/v1/query",
+            "admission_metrics": "/api/v1/admin/admission",
+            "agent_usage": "/api/v1/admin/agent-usage",
         },
     }
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Worker processes share computed results through the cache backend (CACHE_BACKEND=sqlite)
+    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=settings.workers)
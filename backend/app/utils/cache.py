@@ -0,0 +1,121 @@
+"""Cache backends for computed results such as encoded insight payloads and schema digests.
+
+``MemoryCache`` keeps entries inside the process. ``SQLiteCache`` stores them in a SQLite file
+shared by every worker process of a container, so each result is computed once per container
+rather than once per worker. Writes are single ``INSERT OR REPLACE`` statements, which SQLite
+applies atomically. The backend is selected with the ``CACHE_BACKEND`` setting.
+
+Keys are expected to embed the data version they were computed at, so entries never need to be
+invalidated; the TTL only bounds how long unused entries are kept.
+"""
+
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from ..config import settings
+
+
+class CacheBackend(ABC):
+    """Byte-valued key/value cache with per-entry expiry."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the value stored under ``key``, or None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        """Store ``value`` under ``key`` for ``ttl`` seconds (the backend default if None)."""
+
+    def get_or_set(self, key: str, compute: Callable[[], bytes], ttl: Optional[float] = None) -> bytes:
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache."""
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.time() + (self.default_ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteCache(CacheBackend):
+    """Cache stored in a SQLite file, shared by all processes that open the same path."""
+
+    # Expired entries are purged on every this many writes
+    purge_every = 256
+
+    def __init__(self, path: str, default_ttl: float = 3600.0):
+        self.path = path
+        self.default_ttl = default_ttl
+        self._local = threading.local()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)"
+            )
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM cache WHERE key = ? AND expires >= ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        conn = self._connection()
+        expires = time.time() + (self.default_ttl if ttl is None else ttl)
+        conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)", (key, value, expires))
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            conn.execute("DELETE FROM cache WHERE expires < ?", (time.time(),))
+
+
+def create_cache(backend: str) -> CacheBackend:
+    """Build the cache backend named by the ``CACHE_BACKEND`` setting."""
+    if backend == "memory":
+        return MemoryCache(default_ttl=settings.cache_ttl)
+    if backend == "sqlite":
+        path = settings.cache_path or os.path.join(tempfile.gettempdir(), "insight-copilot-cache.db")
+        return SQLiteCache(path, default_ttl=settings.cache_ttl)
+    raise ValueError(f"Unknown cache backend: {backend!r}. Expected 'memory' or 'sqlite'.")
+
+
+cache = create_cache(settings.cache_backend)
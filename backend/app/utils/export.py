@@ -0,0 +1,114 @@
+"""Streaming encoders for bulk query exports.
+
+Each encoder pulls rows from an open sqlite3 cursor ``batch_size`` rows at a time and yields
+one encoded chunk per batch, so at most one batch is held in memory regardless of result size.
+"""
+
+import base64
+import sqlite3
+from typing import Any, Iterator, List
+
+import orjson
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# End-of-stream marker of the Arrow IPC streaming format
+_ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+def column_names(cursor: sqlite3.Cursor) -> List[str]:
+    """Return the result column names of an executed cursor."""
+    return [column[0] for column in cursor.description or ()]
+
+
+def _encode_bytes(value: Any) -> str:
+    """BLOB values as base64 text, in JSON and in Arrow string columns alike."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(value).decode("ascii")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def iter_ndjson(cursor: sqlite3.Cursor, batch_size: int) -> Iterator[bytes]:
+    """Yield the cursor's rows as newline-delimited JSON objects, one chunk per batch.
+
+    BLOB values are encoded as base64 strings.
+    """
+    columns = column_names(cursor)
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        yield b"".join(orjson.dumps(dict(zip(columns, row)), default=_encode_bytes) + b"\n" for row in rows)
+
+
+# Largest integer a float64 holds exactly
+_MAX_EXACT_FLOAT = 2**53
+
+
+def _arrow_value(name: str, value: Any, arrow_type) -> Any:
+    """Convert one value to ``arrow_type`` without losing it, or raise ``ValueError``."""
+    import pyarrow as pa
+
+    if value is None:
+        return None
+    if pa.types.is_string(arrow_type):
+        return _encode_bytes(value) if isinstance(value, bytes) else str(value)
+    if pa.types.is_binary(arrow_type):
+        if isinstance(value, bytes):
+            return value
+        if isinstance(value, str):
+            return value.encode()
+    elif pa.types.is_int64(arrow_type):
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+    elif isinstance(value, float) or (isinstance(value, int) and abs(value) <= _MAX_EXACT_FLOAT):
+        return value
+    raise ValueError(
+        f"Column {name!r} holds {value!r}, which does not fit the {arrow_type} type inferred from the first "
+        "batch; CAST the column in the query or export as NDJSON"
+    )
+
+
+def _arrow_type(values):
+    """The Arrow type of a column from its values in the first batch."""
+    import pyarrow as pa
+
+    kinds = {type(v) for v in values if v is not None}
+    if kinds == {int}:
+        return pa.int64()
+    if kinds == {float} or kinds == {int, float}:
+        return pa.float64()
+    if kinds == {bytes}:
+        return pa.binary()
+    return pa.string()
+
+
+def iter_arrow(cursor: sqlite3.Cursor, batch_size: int) -> Iterator[bytes]:
+    """Yield the cursor's rows as an Arrow IPC stream, one record batch message per chunk.
+
+    SQLite types values rather than columns, and the schema has to be sent before the first
+    batch, so column types are taken from the values of the first batch: int64 if they are all
+    integers, float64 if they are numbers, binary if they are all BLOBs and string otherwise
+    (mixed columns included; BLOBs in a string column are base64). Values of later batches are
+    converted where that is lossless, integers to float64 for example; a value that cannot be
+    represented raises ``ValueError`` rather than being dropped. Requires the optional ``pyarrow``
+    dependency.
+    """
+    import pyarrow as pa
+
+    columns = column_names(cursor)
+    rows = cursor.fetchmany(batch_size)
+    first_values = list(zip(*rows)) or [()] * len(columns)
+    schema = pa.schema([pa.field(name, _arrow_type(values)) for name, values in zip(columns, first_values)])
+    yield schema.serialize().to_pybytes()
+
+    while rows:
+        arrays = [
+            pa.array([_arrow_value(f.name, v, f.type) for v in values], f.type) for values, f in zip(zip(*rows), schema)
+        ]
+        yield pa.RecordBatch.from_arrays(arrays, schema=schema).serialize().to_pybytes()
+        rows = cursor.fetchmany(batch_size)
+    yield _ARROW_EOS
@@ -1,10 +1,13 @@
-from typing import Any, Dict, List
+from typing import TYPE_CHECKING, Any, Dict, List
 
-import pandas as pd
+if TYPE_CHECKING:
+    import pandas as pd
 
 
-def process_data(data: List[Dict[str, Any]]) -> pd.DataFrame:
+def process_data(data: List[Dict[str, Any]]) -> "pd.DataFrame":
     """Convert list of dictionaries to pandas DataFrame."""
+    import pandas as pd
+
     return pd.DataFrame(data)
 
 
@@ -14,7 +17,7 @@ def generate_sql_query(natural_language_query: str) -> str:
     return "SELECT * FROM data LIMIT 10"
 
 
-def format_response(data: pd.DataFrame) -> Dict[str, Any]:
+def format_response(data: "pd.DataFrame") -> Dict[str, Any]:
     """Format DataFrame response for API."""
     return {
         "columns": data.columns.tolist(),
@@ -0,0 +1,118 @@
+"""Startup profiling: per-module import times of the backend and the phases of its startup.
+
+Runs ``python -X importtime`` in a fresh interpreter so the measurement reflects a real cold
+start, then aggregates the report by module. ``profile_startup`` also runs the application's
+lifespan in a fresh interpreter, since tables, snapshots, aggregates and the agent are prepared
+there rather than at import.
+
+    python -m app.utils.profiling [module] [--top 30]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import List, Tuple
+
+
+@dataclass
+class ImportTiming:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+@dataclass
+class StartupTiming:
+    """Seconds spent in each phase of a cold start."""
+
+    imports: float
+    lifespan: float
+    agent: float
+
+    @property
+    def ready(self) -> float:
+        """Until the application accepts requests."""
+        return self.imports + self.lifespan
+
+
+# Imports the module, then enters and leaves the lifespan of its app. Leaving waits for the
+# background agent warmup, so it marks when the first chat request no longer pays for it.
+_STARTUP_SCRIPT = """
+import asyncio, importlib, json, sys, time
+started = time.perf_counter()
+app = getattr(importlib.import_module(sys.argv[1]), sys.argv[2])
+imported = time.perf_counter()
+async def run():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    return ready, time.perf_counter()
+ready, agent = asyncio.run(run())
+print(json.dumps([imported - started, ready - imported, agent - ready]))
+"""
+
+
+def profile_imports(module: str = "app.main") -> Tuple[float, List[ImportTiming]]:
+    """Import ``module`` in a fresh interpreter.
+
+    Returns the wall-clock time of the whole process in seconds and the import timings of
+    every module it loaded, slowest (cumulative) first.
+    """
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        timings.append(ImportTiming(name.strip(), int(self_us), int(cumulative_us), depth))
+    timings.sort(key=lambda timing: timing.cumulative_us, reverse=True)
+    return elapsed, timings
+
+
+def profile_startup(module: str = "app.main", attribute: str = "app") -> StartupTiming:
+    """Import ``module`` and run the lifespan of its ASGI app ``attribute`` in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-c", _STARTUP_SCRIPT, module, attribute],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Starting {module}:{attribute} failed:\n{result.stderr[-2000:]}")
+    return StartupTiming(*json.loads(result.stdout.strip().splitlines()[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import time per module for a cold start")
+    parser.add_argument("module", nargs="?", default="app.main")
+    parser.add_argument("--top", type=int, default=30, help="Number of modules to list")
+    args = parser.parse_args()
+
+    elapsed, timings = profile_imports(args.module)
+    print(f"Cold import of {args.module}: {elapsed * 1000:.0f} ms wall, {len(timings)} modules")
+    if args.module == "app.main":
+        startup = profile_startup(args.module)
+        print(
+            f"Startup: imports {startup.imports * 1000:.0f} ms, lifespan {startup.lifespan * 1000:.0f} ms, "
+            f"agent ready {startup.agent * 1000:.0f} ms later"
+        )
+    print()
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for timing in timings[: args.top]:
+        print(f"{timing.cumulative_us / 1000:14.1f} {timing.self_us / 1000:9.1f}  {timing.module}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Coalescing of identical concurrent computations ("single flight").
+
+Callers that ask for the same key while a computation for it is in flight await that
+computation instead of starting their own, and all receive its result or its exception. A
+caller that is cancelled stops waiting without affecting the others; the computation itself is
+cancelled only once every caller waiting on it has gone.
+"""
+
+import asyncio
+import re
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# Quoted SQL literals and identifiers, whose whitespace and case must be preserved
+_SQL_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+
+
+def normalize_sql(query: str) -> str:
+    """Canonical form of ``query`` for use in keys: runs of whitespace outside literals collapse
+    to one space, surrounding whitespace and trailing semicolons are dropped."""
+    parts = _SQL_QUOTED.split(query.strip().rstrip(";").strip())
+    return "".join(part if i % 2 else re.sub(r"\s+", " ", part) for i, part in enumerate(parts))
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time within an event loop."""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``compute()``, sharing an in-flight call for ``key`` if there is one."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(compute()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # Shielded so one caller's cancellation does not cancel the shared computation
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+                self._forget(key, flight)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,160 @@
+"""Approximate vs. exact aggregate queries: accuracy, interval coverage and speed-up at scale.
+
+Copies the database to a temporary file with the ``rental`` and ``payment`` fact tables
+multiplied ``--scale`` times (see ``benchmarks.columnar``), builds a ``SampleStore`` next to it,
+and runs a set of exploratory aggregate queries plus the approximate insights both exactly and
+from the samples. Reported per query: timings, the mean and largest relative error of the
+estimates, and the share of exact values inside their 95% confidence interval. Distinct counts
+from the HyperLogLog sketches are compared with COUNT(DISTINCT) the same way.
+
+    python -m benchmarks.approximate [--db path] [--scale 10] [--rate 0.1] [--replicates 10] [--repeat 3]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from contextlib import closing
+
+from app.api.insights import registry
+from app.db.approximate import SampleStore, analyze
+from app.db.database import DATABASE_PATH
+from benchmarks.columnar import make_database
+
+QUERIES = {
+    "revenue by month": (
+        "SELECT strftime('%Y-%m', payment_date) AS month, SUM(amount) AS revenue, COUNT(*) AS payments "
+        "FROM payment GROUP BY month"
+    ),
+    "revenue by store": (
+        "SELECT i.store_id, SUM(p.amount) AS revenue, AVG(p.amount) AS avg_payment FROM payment p "
+        "JOIN rental r ON p.rental_id = r.rental_id JOIN inventory i ON r.inventory_id = i.inventory_id "
+        "GROUP BY i.store_id"
+    ),
+    "revenue by rating": (
+        "SELECT f.rating, SUM(p.amount) AS revenue FROM payment p JOIN rental r ON p.rental_id = r.rental_id "
+        "JOIN inventory i ON r.inventory_id = i.inventory_id JOIN film f ON i.film_id = f.film_id GROUP BY f.rating"
+    ),
+    "rentals by weekday": (
+        "SELECT strftime('%w', rental_date) AS weekday, COUNT(*) AS rentals FROM rental GROUP BY weekday"
+    ),
+    "total revenue": "SELECT SUM(amount) AS revenue, COUNT(*) AS payments, SUM(amount) / COUNT(*) AS mean FROM payment",
+}
+
+DISTINCT = (
+    ("rental.customer_id", "customer_id"),
+    ("rental.inventory_id", "inventory_id"),
+)
+
+
+def timed(function, repeat: int):
+    """Median seconds of ``repeat`` calls of ``function``, and its last result."""
+    seconds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        seconds.append(time.perf_counter() - started)
+    return statistics.median(seconds), result
+
+
+def compare(sql: str, exact_rows, estimate):
+    """Relative errors of the estimated cells and whether each exact value lies in its interval."""
+    kinds, _, _ = analyze(sql)
+    keys = [i for i, kind in enumerate(kinds) if kind == "key"]
+    exact = {tuple(row[i] for i in keys): row for row in exact_rows}
+    errors, covered = [], []
+    for row, interval in zip(estimate.rows, estimate.intervals):
+        truth = exact.get(tuple(row[i] for i in keys))
+        if truth is None:
+            continue
+        for i, name in enumerate(estimate.columns):
+            if kinds[i] == "key" or truth[i] is None:
+                continue
+            errors.append(abs(row[i] - truth[i]) / abs(truth[i]) if truth[i] else 0.0)
+            if name in interval:
+                low, high = interval[name]
+                covered.append(low <= truth[i] <= high)
+    return errors, covered
+
+
+def run(args: argparse.Namespace, directory: str) -> None:
+    path = make_database(args.db, args.scale, directory)
+
+    def connect() -> sqlite3.Connection:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+    store = SampleStore(os.path.join(directory, "samples.db"), connect, lambda: "benchmark", args.rate, args.replicates)
+    started = time.perf_counter()
+    store.refresh()
+    with closing(connect()) as conn:
+        (payments,) = conn.execute("SELECT COUNT(*) FROM payment").fetchone()
+    print(
+        f"{payments} payments, sample rate {args.rate:g} with {args.replicates} random groups, "
+        f"built in {(time.perf_counter() - started) * 1000:.0f} ms\n"
+    )
+
+    queries = dict(QUERIES)
+    queries.update({f"insight {i.name}": i.sql(10) for i in registry if i.approximate and i.estimate is None})
+    columns = f"{'exact ms':>9} {'approx ms':>10} {'speed-up':>9} {'mean err':>9} {'max err':>8} {'CI cover':>9}"
+    print(f"{'query':<32} {columns}")
+    all_errors, all_covered = [], []
+    for name, sql in queries.items():
+        with closing(connect()) as conn:
+            exact_seconds, exact_rows = timed(lambda: conn.execute(sql).fetchall(), args.repeat)
+        approx_seconds, estimate = timed(lambda: store.query(sql), args.repeat)
+        if not estimate.approximate:
+            print(f"{name:<32} not estimated: {estimate.reason}")
+            continue
+        errors, covered = compare(sql, exact_rows, estimate)
+        all_errors += errors
+        all_covered += covered
+        print(
+            f"{name:<32} {exact_seconds * 1000:9.1f} {approx_seconds * 1000:10.1f} "
+            f"{exact_seconds / approx_seconds:8.1f}x {statistics.fmean(errors or [0]):9.2%} "
+            f"{max(errors, default=0):8.2%} {sum(covered) / max(len(covered), 1):9.0%}"
+        )
+    if all_errors:
+        print(
+            f"\nall estimates: mean relative error {statistics.fmean(all_errors):.2%}, "
+            f"{sum(all_covered) / max(len(all_covered), 1):.0%} of {len(all_covered)} exact values "
+            "inside their interval"
+        )
+
+    print(f"\n{'distinct count':<32} {columns.replace('approx ms', 'sketch ms')}")
+    for sketch, column in DISTINCT:
+        sql = f"SELECT strftime('%Y-%m', rental_date) AS month, COUNT(DISTINCT {column}) FROM rental GROUP BY month"
+        with closing(connect()) as conn:
+            exact_seconds, exact_rows = timed(lambda: conn.execute(sql).fetchall(), args.repeat)
+            (total,) = conn.execute(f"SELECT COUNT(DISTINCT {column}) FROM rental").fetchone()
+        exact_rows = [(month, count) for month, count in exact_rows if month] + [(None, total)]
+
+        def sketched():
+            return [store.distinct(sketch, "month", None if month is None else [month]) for month, _ in exact_rows]
+
+        sketch_seconds, estimates = timed(sketched, args.repeat)
+        errors = [abs(e.value - count) / count for e, (_, count) in zip(estimates, exact_rows)]
+        covered = [e.low <= count <= e.high for e, (_, count) in zip(estimates, exact_rows)]
+        print(
+            f"{sketch + ' by month, total':<32} {exact_seconds * 1000:9.1f} {sketch_seconds * 1000:10.1f} "
+            f"{exact_seconds / sketch_seconds:8.1f}x {statistics.fmean(errors):9.2%} {max(errors):8.2%} "
+            f"{sum(covered) / len(covered):9.0%}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--scale", type=int, default=10, help="multiply the fact tables this many times")
+    parser.add_argument("--rate", type=float, default=0.1, help="sampling rate")
+    parser.add_argument("--replicates", type=int, default=10, help="random groups for the intervals")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per timing; the median is reported")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="insight-bench-") as directory:
+        run(args, directory)
+
+
+if __name__ == "__main__":
+    main()
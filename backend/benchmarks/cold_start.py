@@ -0,0 +1,49 @@
+"""Cold-start time of the backend process.
+
+Imports ``app.main`` in fresh interpreters and reports the wall-clock distribution, plus the
+heaviest top-level dependencies so regressions can be traced to the import that caused them.
+Then starts the application in fresh interpreters, lifespan included, and reports the time
+until it accepts requests and until the agent is compiled.
+
+    python -m benchmarks.cold_start [--runs 5]
+"""
+
+import argparse
+import statistics
+
+from app.utils.profiling import profile_imports, profile_startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--app", default="app", help="attribute of the module holding the ASGI app")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    runs = [profile_imports(args.module) for _ in range(args.runs)]
+    walls = sorted(elapsed * 1000 for elapsed, _ in runs)
+    print(
+        f"import {args.module}: median {statistics.median(walls):.0f} ms, "
+        f"min {walls[0]:.0f} ms, max {walls[-1]:.0f} ms"
+    )
+
+    # Top-level packages only: nested modules are already included in their parent's cumulative time
+    _, timings = runs[-1]
+    top_level = [timing for timing in timings if timing.depth == 0]
+    for timing in top_level[:10]:
+        print(f"{timing.cumulative_us / 1000:10.1f} ms  {timing.module}")
+
+    startups = [profile_startup(args.module, args.app) for _ in range(args.runs)]
+    print(f"\n{'startup phase':<24} {'median ms':>10} {'max ms':>8}")
+    for phase, values in (
+        ("imports", [s.imports for s in startups]),
+        ("lifespan", [s.lifespan for s in startups]),
+        ("ready to serve", [s.ready for s in startups]),
+        ("agent compiled after", [s.agent for s in startups]),
+    ):
+        print(f"{phase:<24} {statistics.median(values) * 1000:10.0f} {max(values) * 1000:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Columnar engine vs. SQL for the insight aggregations: parity check and timings at scale.
+
+Copies the database to a temporary file, optionally multiplies the ``rental`` and ``payment``
+fact tables ``--scale`` times, then runs every registered insight through its SQLAlchemy
+statement and through ``ColumnarEngine``, and checks the sales-overview buckets of
+``app.db.aggregates`` against the reference query. Rows are then appended to the fact tables and
+the checks repeated after an incremental refresh of both. Exits non-zero if any result differs.
+
+    python -m benchmarks.columnar [--db path] [--scale 10] [--repeat 5]
+"""
+
+import argparse
+import math
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from typing import List
+
+from app.api.insights import registry
+from app.api.pagination import decode_cursor, next_cursor
+from app.db.aggregates import SalesBuckets
+from app.db.columnar import ColumnarEngine
+from app.db.database import DATABASE_PATH
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+
+def make_database(source: str, scale: int, directory: str) -> str:
+    """Copy ``source`` into ``directory`` with the fact tables multiplied ``scale`` times."""
+    path = os.path.join(directory, "sakila.db")
+    with sqlite3.connect(source) as src, sqlite3.connect(path) as dst:
+        src.backup(dst)
+    with sqlite3.connect(path) as conn:
+        (offset,) = conn.execute(
+            "SELECT MAX(MAX(rental_id), (SELECT MAX(payment_id) FROM payment)) FROM rental"
+        ).fetchone()
+        for k in range(1, scale):
+            shift = k * offset
+            conn.execute(
+                "INSERT INTO rental SELECT rental_id + ?, datetime(rental_date, ?), inventory_id, customer_id, "
+                "return_date, staff_id, last_update FROM rental WHERE rental_id <= ?",
+                (shift, f"+{k} seconds", offset),
+            )
+            conn.execute(
+                "INSERT INTO payment SELECT payment_id + ?, customer_id, staff_id, rental_id + ?, amount, "
+                "payment_date, last_update FROM payment WHERE payment_id <= ?",
+                (shift, shift, offset),
+            )
+    return path
+
+
+def append_facts(path: str, rentals: int) -> None:
+    """Append copies of the first ``rentals`` rentals and their payments, dated a month later, under
+    new ids. The copies fall into existing months as well as new ones."""
+    with sqlite3.connect(path) as conn:
+        (offset,) = conn.execute(
+            "SELECT MAX(MAX(rental_id), (SELECT MAX(payment_id) FROM payment)) FROM rental"
+        ).fetchone()
+        conn.execute(
+            "INSERT INTO rental SELECT rental_id + ?, datetime(rental_date, '+1 month'), inventory_id, customer_id, "
+            "return_date, staff_id, last_update FROM rental ORDER BY rental_id LIMIT ?",
+            (offset, rentals),
+        )
+        conn.execute(
+            "INSERT INTO payment SELECT payment_id + ?, customer_id, staff_id, rental_id + ?, amount, "
+            "datetime(payment_date, '+1 month'), last_update FROM payment WHERE rental_id IN "
+            "(SELECT rental_id FROM rental ORDER BY rental_id LIMIT ?)",
+            (offset, offset, rentals),
+        )
+
+
+def same_rows(expected, actual) -> bool:
+    if len(expected) != len(actual):
+        return False
+    for left, right in zip(expected, actual):
+        for a, b in zip(tuple(left), tuple(right)):
+            if isinstance(a, float) or isinstance(b, float):
+                if not math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6):
+                    return False
+            elif a != b:
+                return False
+    return True
+
+
+def all_pages(fetch, rank_attr, id_attr, limit=100):
+    rows, position = [], None
+    while True:
+        page = fetch(limit, position)
+        rows.extend(page)
+        cursor = next_cursor(page, limit, rank_attr, id_attr)
+        if cursor is None:
+            return rows
+        position = decode_cursor(cursor)
+
+
+def best_of(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def parity_failures(db: Session, engine: ColumnarEngine, buckets: SalesBuckets) -> List[str]:
+    """Names of the insights whose columnar or bucketed results differ from their statement."""
+    failures = []
+    for insight in registry:
+        if insight.compute is not None:
+            continue
+        columnar = getattr(engine, insight.name)
+        if insight.keyset is not None:
+            labels = (insight.keyset.rank_label, insight.keyset.id_label)
+            expected = all_pages(lambda n, p: insight.run_sql(db, n, p), *labels)
+            actual = all_pages(columnar, *labels)
+        else:
+            expected, actual = insight.run_sql(db), columnar()
+            if insight.name == "regional_sales":
+                # Ties in total sales have no defined order in SQL
+                expected, actual = (
+                    sorted(rows, key=lambda row: (-round(row.sales, 6), row.region)) for rows in (expected, actual)
+                )
+        if not same_rows(expected, actual):
+            failures.append(insight.name)
+
+    # The sales-overview route serves precomputed buckets; its payload rows must equal those of the
+    # reference query exactly, amounts rounded to cents included
+    adapter = registry["sales_overview"].adapter
+    if adapter.adapt(registry["sales_overview"].run_sql(db)) != adapter.adapt(buckets.overview("month", limit=12)):
+        failures.append("sales_overview buckets")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default=DATABASE_PATH)
+    parser.add_argument("--scale", type=int, default=1, help="Multiply the fact tables this many times")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--append", type=int, default=1000, help="Rentals appended before the incremental check")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="insight-bench-") as directory:
+        path = make_database(args.db, args.scale, directory)
+        db_engine = create_engine(f"sqlite:///{path}")
+        # Bumped after appending rows, which is what triggers the incremental refreshes
+        version = {"value": 0}
+        engine = ColumnarEngine(lambda: sqlite3.connect(path), lambda: str(version["value"]))
+        buckets = SalesBuckets(
+            os.path.join(directory, "aggregates.db"), lambda: sqlite3.connect(path), lambda: str(version["value"])
+        )
+        started = time.perf_counter()
+        engine.refresh()
+        with sqlite3.connect(path) as conn:
+            (payments,) = conn.execute("SELECT COUNT(*) FROM payment").fetchone()
+        print(f"{payments} payments, columnar load {(time.perf_counter() - started) * 1000:.0f} ms\n")
+
+        with Session(db_engine) as db:
+            failures = parity_failures(db, engine, buckets)
+            print(f"{'insight':<22} {'sql ms':>9} {'columnar ms':>12} {'speed-up':>9}  parity")
+            for insight in registry:
+                if insight.compute is not None:
+                    continue
+                name, columnar = insight.name, getattr(engine, insight.name)
+                if insight.keyset is not None:
+                    sql_fn, columnar_fn = (lambda: insight.run_sql(db, 10)), (lambda: columnar(10))
+                else:
+                    sql_fn, columnar_fn = (lambda: insight.run_sql(db)), columnar
+                sql_ms, columnar_ms = best_of(sql_fn, args.repeat), best_of(columnar_fn, args.repeat)
+                parity = "MISMATCH" if name in failures else "ok"
+                print(f"{name:<22} {sql_ms:9.1f} {columnar_ms:12.2f} {sql_ms / columnar_ms:8.0f}x  {parity}")
+            if "sales_overview buckets" in failures:
+                print("sales_overview buckets: MISMATCH")
+
+        # Incremental refresh: appended rows must be picked up without a full reload
+        append_facts(path, args.append)
+        version["value"] += 1
+        started = time.perf_counter()
+        engine.refresh()
+        buckets.refresh()
+        print(f"\nappended {args.append} rentals, incremental refresh {(time.perf_counter() - started) * 1000:.0f} ms")
+        with Session(db_engine) as db:
+            appended = parity_failures(db, engine, buckets)
+        print(f"parity after append: {'MISMATCH ' + ', '.join(appended) if appended else 'ok'}")
+        failures += [f"{name} (after append)" for name in appended]
+        db_engine.dispose()
+
+    if failures:
+        sys.exit(f"Columnar results differ from SQL for: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    main()
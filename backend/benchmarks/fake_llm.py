@@ -0,0 +1,117 @@
+"""Scripted stand-in for the agent's chat model, used to load-test without calling a provider.
+
+``ScriptedChatModel`` follows the tool-calling pattern a real model produces for this agent: it
+asks for the schema, runs one of a few canned queries per part of the question (parts are
+separated by "; "), then answers with a summary of the result. Asked to plan, it splits the
+question into those parts; asked to merge, it joins the sub-answers. Each call sleeps for a
+configurable, jittered latency and reports token usage estimated from the message sizes, so
+downstream code sees realistic timings and metadata.
+
+``install`` swaps it in for ``load_chat_model`` in the agent graph.
+"""
+
+import asyncio
+import random
+import time
+import uuid
+import zlib
+from typing import Any, List, Optional, Sequence
+
+from app.agent import prompts
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+QUERIES = (
+    "SELECT c.name AS category, SUM(p.amount) AS revenue FROM category c "
+    "JOIN film_category fc ON c.category_id = fc.category_id JOIN inventory i ON fc.film_id = i.film_id "
+    "JOIN rental r ON i.inventory_id = r.inventory_id JOIN payment p ON r.rental_id = p.rental_id "
+    "GROUP BY c.name ORDER BY revenue DESC",
+    "SELECT strftime('%Y-%m', payment_date) AS month, SUM(amount) AS revenue FROM payment GROUP BY month",
+    "SELECT f.title, COUNT(r.rental_id) AS rentals FROM film f JOIN inventory i ON f.film_id = i.film_id "
+    "JOIN rental r ON i.inventory_id = r.inventory_id GROUP BY f.film_id ORDER BY rentals DESC LIMIT 10",
+    "SELECT s.store_id, COUNT(DISTINCT c.customer_id) AS customers FROM store s "
+    "JOIN customer c ON s.store_id = c.store_id GROUP BY s.store_id",
+    "SELECT SUM(amount) AS total_revenue FROM payment",
+)
+
+
+def _estimate_tokens(messages: Sequence[BaseMessage]) -> int:
+    return sum(len(str(message.content)) for message in messages) // 4 + 1
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that replays a schema → query → answer tool-calling script.
+
+    Args:
+        latency: Mean seconds each call takes.
+        jitter: Fraction of ``latency`` the actual delay varies by, uniformly in both directions.
+        seed: Seed for the latency and query choice, for reproducible runs.
+    """
+
+    latency: float = 0.5
+    jitter: float = 0.3
+    seed: Optional[int] = None
+
+    def model_post_init(self, __context: Any) -> None:
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedChatModel":
+        return self
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency * (1 + self._random.uniform(-self.jitter, self.jitter)))
+
+    def _respond(self, messages: List[BaseMessage]) -> AIMessage:
+        last = messages[-1]
+        system = str(messages[0].content) if messages and messages[0].type == "system" else ""
+        question = next((str(m.content) for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        turn = messages[max(i for i, m in enumerate(messages) if isinstance(m, HumanMessage)) :] if question else []
+        # A branch answers one part, whatever its prompt quotes of the full question, and is given the schema
+        branch = question.startswith(prompts.BRANCH_PROMPT.split("{")[0])
+        parts = [question] if branch else question.split("; ")
+        queries_run = sum(1 for m in turn if isinstance(m, ToolMessage) and m.name == "run_query")
+        if system.startswith(prompts.PLANNER_PROMPT.split("{")[0]):
+            content, tool_calls = "", [{"name": "Plan", "args": {"tasks": parts}, "id": uuid.uuid4().hex}]
+        elif system.startswith(prompts.MERGE_PROMPT.split("{")[0]):
+            content, tool_calls = f"Putting the parts together: {system[-200:]}", []
+        elif (isinstance(last, ToolMessage) or branch) and queries_run < len(parts):
+            query = QUERIES[zlib.crc32(parts[queries_run].encode()) % len(QUERIES)]
+            content, tool_calls = "", [{"name": "run_query", "args": {"query": query}, "id": uuid.uuid4().hex}]
+        elif isinstance(last, ToolMessage):
+            content, tool_calls = f"Here is what the data shows: {str(last.content)[:200]}", []
+        else:
+            content, tool_calls = "", [{"name": "get_schema", "args": {}, "id": uuid.uuid4().hex}]
+        input_tokens = _estimate_tokens(messages)
+        output_tokens = len(content) // 4 + 20 * len(tool_calls) + 1
+        return AIMessage(
+            id=f"run-{uuid.uuid4()}",
+            content=content,
+            tool_calls=tool_calls,
+            usage_metadata={
+                "input_tokens": input_tokens,
+                "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens,
+            },
+        )
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._delay())
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+
+def install(latency: float = 0.5, jitter: float = 0.3, seed: Optional[int] = None) -> ScriptedChatModel:
+    """Make the agent graph use a ``ScriptedChatModel`` instead of loading the configured model."""
+    from app.agent import graph
+
+    model = ScriptedChatModel(latency=latency, jitter=jitter, seed=seed)
+    graph.load_chat_model = lambda fully_specified_name: model
+    return model
@@ -0,0 +1,76 @@
+"""Sequential tool loop vs. parallel sub-question branches for compound questions.
+
+Runs the agent graph in process with ``benchmarks.fake_llm.ScriptedChatModel``, on questions of
+one to ``--max-parts`` independent parts, once with planning disabled (every part costs another
+model round-trip in the tool loop) and once fanned out into one branch per part. Reports the
+wall-clock time of each turn and the number of model calls.
+
+    python -m benchmarks.fan_out [--max-parts 4] [--llm-latency 0.5] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from unittest import mock
+
+from benchmarks import fake_llm
+from langchain_core.messages import HumanMessage
+
+PARTS = (
+    "What is the revenue per film category",
+    "What is the monthly revenue",
+    "What are the ten most rented films",
+    "How many customers does each store have",
+    "What is the total revenue",
+)
+
+
+async def turn(graph, question: str, max_parallel_tasks: int) -> float:
+    config = {"configurable": {"thread_id": uuid.uuid4().hex, "max_parallel_tasks": max_parallel_tasks}}
+    started = time.perf_counter()
+    await graph.ainvoke({"messages": [HumanMessage(content=question)]}, config)
+    return time.perf_counter() - started
+
+
+async def run(args: argparse.Namespace) -> None:
+    from app.agent import graph as agent_graph
+    from app.agent import tools
+    from app.agent.accounting import ledger
+
+    # Progress events need a CopilotKit run to go to
+    tools.copilotkit_emit_state = mock.AsyncMock()
+    graph = agent_graph.graph
+
+    print(f"{'parts':>5} {'sequential s':>13} {'calls':>6} {'fan-out s':>10} {'calls':>6} {'speed-up':>9}")
+    for parts in range(1, min(args.max_parts, len(PARTS)) + 1):
+        question = "; ".join(PARTS[:parts])
+        timings = {}
+        for mode, max_tasks in (("sequential", 1), ("fan-out", len(PARTS))):
+            steps = ledger.totals()["steps"]
+            seconds = [await turn(graph, question, max_tasks) for _ in range(args.repeat)]
+            calls = (ledger.totals()["steps"] - steps) / args.repeat
+            timings[mode] = (statistics.median(seconds), calls)
+        (sequential, sequential_calls), (fan_out, fan_out_calls) = timings["sequential"], timings["fan-out"]
+        print(
+            f"{parts:5d} {sequential:13.2f} {sequential_calls:6.0f} {fan_out:10.2f} {fan_out_calls:6.0f} "
+            f"{sequential / fan_out:8.1f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--max-parts", type=int, default=4, help=f"largest number of question parts (≤ {len(PARTS)})")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean seconds per fake model call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="latency variation as a fraction")
+    parser.add_argument("--repeat", type=int, default=3, help="turns per measurement; the median is reported")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake_llm.install(latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
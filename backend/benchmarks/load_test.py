@@ -0,0 +1,226 @@
+"""Load test of one backend instance with simulated chat users, without a model provider.
+
+The agent's chat model is replaced by ``benchmarks.fake_llm.ScriptedChatModel``, so every
+conversation runs the real graph, tools and SQL against the local database while model calls
+only cost their configured latency. The app is served by uvicorn in a background thread and
+driven over HTTP by concurrent users, each of which holds conversations on ``/copilotkit`` and
+fetches insight routes in between.
+
+Reported: p50/p95/p99 latency and throughput per endpoint, lag of the server's event loop, and
+resident memory growth per conversation after a warm-up round.
+
+    python -m benchmarks.load_test [--users 20] [--conversations 5] [--llm-latency 0.5]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import random
+import resource
+import statistics
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import uvicorn
+from app.api.insights import registry
+from benchmarks import fake_llm
+
+AGENT_NAME = "insight_copilot_agent"
+
+INSIGHT_ROUTES = tuple(
+    f"/api/v1{insight.path}" + ("?limit=10" if insight.keyset is not None else "") for insight in registry
+)
+
+QUESTIONS = (
+    "What is the total revenue?",
+    "Which film categories bring in the most money?",
+    "Show me monthly revenue.",
+    "What are the ten most rented films?",
+    "How many customers does each store have?",
+)
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process; peak RSS where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Linear-interpolated ``q``-th percentile (0-100) of ``values``."""
+    ordered = sorted(values)
+    if not ordered:
+        return float("nan")
+    k = (len(ordered) - 1) * q / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+class LagMonitor:
+    """Measures how late the event loop it runs on wakes up from short sleeps."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples: List[float] = []
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, loop.time() - started - self.interval))
+
+
+class BackgroundServer:
+    """Runs ``app`` with uvicorn in a daemon thread, with a ``LagMonitor`` on its event loop."""
+
+    def __init__(self, app, port: int):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.lag = LagMonitor()
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+
+    async def _serve(self) -> None:
+        probe = asyncio.create_task(self.lag.run())
+        try:
+            await self.server.serve()
+        finally:
+            probe.cancel()
+
+    def __enter__(self) -> "BackgroundServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+
+
+async def converse(client: httpx.AsyncClient, question: str, client_id: str) -> None:
+    """Hold one single-turn conversation with the agent and read the event stream to the end."""
+    body = {
+        "name": AGENT_NAME,
+        "threadId": str(uuid.uuid4()),
+        "state": {},
+        "config": {},
+        "messages": [{"type": "TextMessage", "role": "user", "content": question, "id": str(uuid.uuid4())}],
+        "actions": [],
+    }
+    headers = {"X-Client-Id": client_id}
+    async with client.stream("POST", "/copilotkit/agents/execute", json=body, headers=headers) as response:
+        response.raise_for_status()
+        async for _ in response.aiter_bytes():
+            pass
+
+
+async def fetch(client: httpx.AsyncClient, route: str) -> None:
+    response = await client.get(route)
+    response.raise_for_status()
+
+
+async def timed(name: str, call, latencies: Dict[str, List[float]], errors: Dict[str, int]) -> None:
+    started = time.perf_counter()
+    try:
+        await call
+    except Exception:
+        errors[name] += 1
+    else:
+        latencies[name].append(time.perf_counter() - started)
+
+
+async def simulate_user(
+    client: httpx.AsyncClient,
+    rng: random.Random,
+    conversations: int,
+    insight_requests: int,
+    latencies: Dict[str, List[float]],
+    errors: Dict[str, int],
+) -> None:
+    # Each simulated user counts as its own client when AGENT_CLIENT_ID_HEADER=X-Client-Id
+    client_id = uuid.uuid4().hex
+    for _ in range(conversations):
+        await timed("/copilotkit", converse(client, rng.choice(QUESTIONS), client_id), latencies, errors)
+        for route in rng.sample(INSIGHT_ROUTES, min(insight_requests, len(INSIGHT_ROUTES))):
+            name = route.split("?")[0]
+            await timed(name, fetch(client, route), latencies, errors)
+
+
+async def run_load(base_url: str, args) -> tuple:
+    latencies: Dict[str, List[float]] = defaultdict(list)
+    errors: Dict[str, int] = defaultdict(int)
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        # Warm-up: compiles the graph, loads caches and allocator pools before memory is measured
+        await simulate_user(client, random.Random(0), 1, len(INSIGHT_ROUTES), defaultdict(list), defaultdict(int))
+
+        gc.collect()
+        rss_before = rss_bytes()
+        rngs = [random.Random(None if args.seed is None else args.seed + user) for user in range(args.users)]
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(simulate_user(client, rng, args.conversations, args.insight_requests, latencies, errors) for rng in rngs)
+        )
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        rss_after = rss_bytes()
+    return latencies, errors, elapsed, rss_after - rss_before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--conversations", type=int, default=5, help="conversations per user")
+    parser.add_argument("--insight-requests", type=int, default=3, help="insight routes fetched after each turn")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="mean seconds per fake model call")
+    parser.add_argument("--llm-jitter", type=float, default=0.3, help="latency variation as a fraction")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-request client timeout in seconds")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    fake_llm.install(latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+    from app.main import app
+
+    with BackgroundServer(app, args.port) as server:
+        latencies, errors, elapsed, rss_growth = asyncio.run(run_load(f"http://127.0.0.1:{args.port}", args))
+        lag = list(server.lag.samples)
+
+    conversations = args.users * args.conversations
+    total = sum(len(values) for values in latencies.values()) + sum(errors.values())
+    print(
+        f"{args.users} users x {args.conversations} conversations, fake model latency "
+        f"{args.llm_latency * 1000:.0f} ms ± {args.llm_jitter:.0%}: {total} requests in {elapsed:.1f} s "
+        f"({total / elapsed:.1f} req/s, {conversations / elapsed:.2f} conversations/s)"
+    )
+    print(f"{'endpoint':42} {'ok':>6} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name in sorted(set(latencies) | set(errors)):
+        values = [value * 1000 for value in latencies[name]]
+        print(
+            f"{name:42} {len(values):6d} {errors[name]:5d} {len(values) / elapsed:8.1f} "
+            f"{percentile(values, 50):9.1f} {percentile(values, 95):9.1f} {percentile(values, 99):9.1f}"
+        )
+    lag_ms = [value * 1000 for value in lag]
+    print(
+        f"event-loop lag: mean {statistics.fmean(lag_ms) if lag_ms else float('nan'):.1f} ms, "
+        f"p99 {percentile(lag_ms, 99):.1f} ms, max {max(lag_ms, default=float('nan')):.1f} ms"
+    )
+    print(
+        f"memory: RSS grew {rss_growth / 2**20:.1f} MiB over {conversations} conversations "
+        f"({rss_growth / max(conversations, 1) / 1024:.1f} KiB per conversation)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Serialization cost of insight payloads per 10k rows, before and after the orjson row adapters.
+
+"before" reproduces the original handler path: build a dict per row with ``float(...)`` over
+``Decimal`` values, then let FastAPI run ``jsonable_encoder`` and ``json.dumps`` on the result.
+"after" is the shared response layer: rows mapped onto slotted dataclasses and encoded once by
+orjson.
+
+Before timing, the payload of every insight endpoint is fetched and diffed against the original
+handlers' serialization of the same statement's rows: ``Numeric`` columns read as ``Decimal`` at
+their declared scale, then converted with ``float(...)``. Any difference in values fails the run.
+
+    python -m benchmarks.serialization [--rows 10000] [--repeat 20]
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import timeit
+from collections import namedtuple
+from contextlib import closing
+from decimal import Decimal
+
+from app.api.insights import registry
+from app.db.database import DATABASE_PATH
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.dialects import sqlite
+
+FilmRow = namedtuple("FilmRow", "film_id title rental_count rental_rate total_revenue")
+
+
+def make_rows(n: int, decimal: bool):
+    number = Decimal if decimal else float
+    return [FilmRow(i, f"FILM TITLE {i}", i % 40, number("4.99"), number(f"{(i % 500) + 0.99:.2f}")) for i in range(n)]
+
+
+def before(rows) -> bytes:
+    content = {
+        "status": "success",
+        "data": [
+            {
+                "title": film.title,
+                "rental_count": film.rental_count,
+                "rental_rate": float(film.rental_rate),
+                "total_revenue": float(film.total_revenue),
+            }
+            for film in rows
+        ],
+    }
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def after(rows) -> bytes:
+    return registry["top_films"].adapter.encode(rows)
+
+
+def baseline_payload(insight, conn: sqlite3.Connection) -> dict:
+    """The payload the original handler built from the rows of ``insight``'s statement (first page)."""
+    processors = []
+    for column in insight.statement.selected_columns:
+        # Look through type_coerce(..., Float) to the type the original query returned
+        element = getattr(column, "element", column)
+        processors.append(getattr(element, "clause", element).type.result_processor(sqlite.dialect(), None))
+    names = set(insight.adapter.fields)
+    data = []
+    for row in conn.execute(insight.sql(10)):
+        values = [value if process is None else process(value) for process, value in zip(processors, row)]
+        data.append(
+            {
+                name: float(value) if isinstance(value, Decimal) else value
+                for name, value in zip((c.key for c in insight.statement.selected_columns), values)
+                if name in names
+            }
+        )
+    return {"status": "success", "data": data}
+
+
+def payload_differences() -> list:
+    """Insights whose endpoint payload differs from the original serialization, with the first difference."""
+    from app.main import app
+    from fastapi.testclient import TestClient
+
+    differences = []
+    with TestClient(app) as client, closing(sqlite3.connect(DATABASE_PATH)) as conn:
+        for insight in registry:
+            expected = baseline_payload(insight, conn)["data"]
+            served = client.get(f"/api/v1{insight.path}").json()["data"]
+            mismatched = [(e, s) for e, s in zip(expected, served) if e != s]
+            if len(expected) != len(served):
+                differences.append((insight.name, f"{len(served)} rows instead of {len(expected)}"))
+            elif mismatched:
+                differences.append((insight.name, f"{mismatched[0][1]} instead of {mismatched[0][0]}"))
+    return differences
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    differences = payload_differences()
+    for name, difference in differences:
+        print(f"{name}: payload differs from the original handler: {difference}")
+    if differences:
+        sys.exit(1)
+    print(f"payloads of all {len(list(registry))} insights match the original handlers\n")
+
+    decimal_rows = make_rows(args.rows, decimal=True)
+    float_rows = make_rows(args.rows, decimal=False)
+    assert json.loads(before(decimal_rows)) == json.loads(after(float_rows))
+
+    scale = 10_000 / args.rows
+    results = {}
+    for name, fn, rows in (("before", before, decimal_rows), ("after", after, float_rows)):
+        best = min(timeit.repeat(lambda: fn(rows), number=1, repeat=args.repeat))
+        results[name] = best * scale * 1000
+        print(f"{name:>6}: {results[name]:8.2f} ms per 10k rows")
+    print(f"speed-up: {results['before'] / results['after']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()